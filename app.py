@@ -1,8 +1,44 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from controllers import club_controller
+from controllers import admin_controller, club_controller, metrics_controller
 from fastapi.middleware.cors import CORSMiddleware
+from core.app_settings import get_settings
+from core.database import READ_PRIMARY_HEADER, read_primary_marker
+from services.ai_api_client import ai_api
+from services.global_ranking_service import global_ranking
+from services.quiz_job_service import quiz_jobs
+from services.reference_data_service import reference_data
+from services.score_pipeline_service import score_pipeline
+
+
+# Tareas en segundo plano que viven mientras corre el worker
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_tasks = [asyncio.create_task(global_ranking.run()),
+                        asyncio.create_task(reference_data.run()),
+                        asyncio.create_task(quiz_jobs.run()),
+                        asyncio.create_task(score_pipeline.run())]
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    try:
+        await quiz_jobs.shutdown()
+    except Exception:
+        logging.getLogger(__name__).exception("Could not mark unfinished quiz jobs as failed")
+    # Los puntajes pendientes se aplican antes de salir (con un límite de tiempo)
+    try:
+        await asyncio.wait_for(score_pipeline.drain(), get_settings().SCORE_PIPELINE_DRAIN_SECONDS)
+    except asyncio.TimeoutError:
+        logging.getLogger(__name__).error("Score pipeline drain timed out with %s events queued",
+                                          score_pipeline.queue.qsize())
+    await ai_api.aclose()
+
 # Crear la instancia de la aplicación
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 # Incluir el middleware para permitir CORS
 app.add_middleware(
     CORSMiddleware,
@@ -10,9 +46,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET","POST","PUT","UPDATE", "PATCH"],
     allow_headers=["*"],
+    expose_headers=[READ_PRIMARY_HEADER],
 )
+# Devuelve al cliente la marca para leer del primario después de escribir
+app.middleware("http")(read_primary_marker)
 # Incluir los routers (controladores)
 app.include_router(club_controller.club_router)
+app.include_router(metrics_controller.metrics_router)
+app.include_router(admin_controller.admin_router)
 # Código para correr la aplicación
 # if __name__ == "__main__":
 #     import uvicorn
@@ -0,0 +1,23 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from core.app_settings import get_settings
+from services.reference_data_service import reference_data
+
+settings = get_settings()
+
+# Los endpoints de administración solo existen si se configuró ADMIN_API_KEY
+def verify_admin_key(x_admin_key: Optional[str] = Header(default=None)):
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_key is None or not secrets.compare_digest(x_admin_key, settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+admin_router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(verify_admin_key)])
+
+@admin_router.post("/reference-data/refresh", summary="Reload careers and the medal catalog from the database")
+async def refresh_reference_data():
+    data = await reference_data.refresh()
+    return {"careers": len(data.careers), "medal_qualities": len(data.medal_catalog), "as_of": data.as_of}
@@ -1,108 +1,167 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-
-from models.responses import NewClub, UpdateClub, NewParticipant, UserID, ResourceToUpload, QuizSubmit, ProfileInfoUp
-from services.club_service import ClubService, get_token_club
-from services.quiz_service import QuizService
-from services.resource_service import ResourceService
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Path, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from core.app_settings import get_settings
+from core.http_cache import etag_response
+from models.responses import NewClub, UpdateClub, NewParticipant, UserID, ResourceToUpload, QuizSubmit, ProfileInfoUp, UserIDs, BulkUserIDs
+from services.club_service import ClubService, get_token_club, get_club_service
+from services.global_ranking_service import global_ranking
+from services.reference_data_service import reference_data
+from services.quiz_job_service import quiz_jobs
+from services.quiz_service import QuizService, get_quiz_service
+from services.resource_service import ResourceService, get_resource_service
 
 club_router = APIRouter(prefix="/club", tags=["Club"])
-club_service = ClubService()
-resource_service = ResourceService()
-quiz_service = QuizService()
+# Carreras y medallas cambian muy rara vez: el cliente puede reutilizarlas sin volver a preguntar
+REFERENCE_CACHE_CONTROL = f"public, max-age={get_settings().REFERENCE_DATA_HTTP_MAX_AGE}"
 
 def validate_founder_role(rolename:str):
     return rolename == "Founder"
 
 @club_router.post("/create")
-async def create_club(info: NewClub):
-    if not club_service.create_club(info):
+async def create_club(info: NewClub, club_service: ClubService = Depends(get_club_service)):
+    if not await club_service.create_club(info):
         raise HTTPException(status_code=400, detail="Error while creating new club")
     return {"message": "Club created successfully"}
 
 @club_router.put("/update")
 async def update_club(info: UpdateClub,
-                      token: dict = Depends(get_token_club)):
+                      token: dict = Depends(get_token_club),
+                      club_service: ClubService = Depends(get_club_service)):
     if validate_founder_role(token.get("role")):
-        club_service.update_club(info, token.get("club"))
+        await club_service.update_club(info, token.get("club"))
         return {"message": "Club updated successfully"}
     else:
         raise HTTPException(status_code=401, detail="You are not authorized to update this club")
 
 @club_router.put("/delete/")
-async def delete_club(token: dict = Depends(get_token_club)):
+async def delete_club(token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
     if validate_founder_role(token.get("role")):
-        club_service.delete_club(token.get("club"))
+        await club_service.delete_club(token.get("club"))
         return {"message": "Club deleted successfully"}
     else:
         raise HTTPException(status_code=401, detail="You are not authorized to delete this club")
 
 @club_router.get("/get/{club_id}")
-async def get_club(club_id: str):
-    club = club_service.get_club(club_id)
+async def get_club(club_id: str, club_service: ClubService = Depends(get_club_service)):
+    club = await club_service.get_club(club_id)
     if not club:
         raise HTTPException(status_code=404, detail="Club not found")
     return club
 
+@club_router.get("/get/id/{club_id}", summary="Get an active club by id")
+async def get_club_by_id(club_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_club_by_id(club_id)
+
+@club_router.get("/get/code/{club_code}", summary="Get an active club by its code")
+async def get_club_by_code(club_code: str, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_club_by_code(club_code)
+
 @club_router.get("/get/all/{user_id}")
-async def get_all_clubs(user_id: int):
-    return club_service.get_all_clubs(user_id)
+async def get_all_clubs(user_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_all_clubs(user_id)
+
+@club_router.get("/discover/{user_id}", summary="Search clubs the user can join, paginated by cursor")
+async def discover_clubs(user_id: int,
+                         search: Optional[str] = Query(None, max_length=60),
+                         is_private: Optional[bool] = None,
+                         is_academic: Optional[bool] = None,
+                         cursor: Optional[int] = None,
+                         limit: int = Query(20, ge=1, le=100),
+                         club_service: ClubService = Depends(get_club_service)):
+    return await club_service.discover_clubs(user_id, search, is_private, is_academic, cursor, limit)
 
 @club_router.get("/get/founded/{user_id}", summary="List clubs where the user is the founder")
-async def get_founded_clubs(user_id: int):
-    return club_service.get_founded_clubs(user_id)
+async def get_founded_clubs(user_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_founded_clubs(user_id)
 
 @club_router.get("/get/joined/{user_id}", summary="List clubs where the user is a member")
-async def get_joined_clubs(user_id: int):
-    return club_service.get_joined_clubs(user_id)
+async def get_joined_clubs(user_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_joined_clubs(user_id)
+
+@club_router.get("/get/mine/{user_id}", summary="Founded, joined, pending and rejected clubs of the user in one call")
+async def get_my_clubs(user_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_my_clubs(user_id)
 
 
 #traer los clubes en los que fuí rechazado o en los que solicité membresía
 @club_router.get("/get/requests/id/{user_id}")
-async def get_requests(user_id: int):
-    return club_service.get_requests(user_id)
+async def get_requests(user_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_requests(user_id)
 
 @club_router.post("/add/member")
-async def add_member(new_member: NewParticipant):
-    if not club_service.add_member(new_member.id_club, new_member.id_user):
+async def add_member(new_member: NewParticipant, club_service: ClubService = Depends(get_club_service)):
+    if not await club_service.add_member(new_member.id_club, new_member.id_user):
         raise HTTPException(status_code=400, detail="Error while adding member")
     return {"message": "Member added successfully"}
 
 #request to join
 @club_router.post("/membership/request")
-async def request_membership(new_member: NewParticipant):
-    if not club_service.request_membership(new_member.id_club, new_member.id_user):
+async def request_membership(new_member: NewParticipant, club_service: ClubService = Depends(get_club_service)):
+    if not await club_service.request_membership(new_member.id_club, new_member.id_user):
         raise HTTPException(status_code=400, detail="Error while requesting membership")
     return {"message": "Membership requested successfully"}
 
 @club_router.patch("/membership/approve")
-async def approve_membership(membership: UserID, token: dict = Depends(get_token_club)):
+async def approve_membership(membership: UserID, token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
     if validate_founder_role(token.get("role")):
-        club_service.approve_membership(token.get("club"), membership.id_user)
+        await club_service.approve_membership(token.get("club"), membership.id_user)
         return {"message": "Membership approved successfully"}
     else:
         raise HTTPException(status_code=401, detail="You are not authorized to approve membership")
 
 
 @club_router.patch("/membership/reject")
-async def reject_membership(membership: UserID, token: dict = Depends(get_token_club)):
+async def reject_membership(membership: UserID, token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
     if validate_founder_role(token.get("role")):
-        club_service.reject_membership(token.get("club"), membership.id_user)
+        await club_service.reject_membership(token.get("club"), membership.id_user)
         return {"message": "Membership rejected successfully"}
     else:
         raise HTTPException(status_code=401, detail="You are not authorized to reject membership")
 
 
+@club_router.patch("/membership/approve/bulk", summary="Approve many membership requests in one transaction")
+async def approve_memberships(memberships: BulkUserIDs, token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
+    if validate_founder_role(token.get("role")):
+        return await club_service.approve_memberships(token.get("club"), memberships.user_ids)
+    else:
+        raise HTTPException(status_code=401, detail="You are not authorized to approve membership")
+
+@club_router.patch("/membership/reject/bulk", summary="Reject many membership requests in one transaction")
+async def reject_memberships(memberships: BulkUserIDs, token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
+    if validate_founder_role(token.get("role")):
+        return await club_service.reject_memberships(token.get("club"), memberships.user_ids)
+    else:
+        raise HTTPException(status_code=401, detail="You are not authorized to reject membership")
+
+@club_router.post("/add/members/bulk", summary="Add many users to the club in one transaction")
+async def add_members(members: BulkUserIDs, token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
+    if validate_founder_role(token.get("role")):
+        return await club_service.add_members(token.get("club"), members.user_ids)
+    else:
+        raise HTTPException(status_code=401, detail="You are not authorized to add members")
+
+@club_router.patch("/membership/remove/bulk", summary="Remove many members in one transaction")
+async def remove_members(members: BulkUserIDs, token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
+    if validate_founder_role(token.get("role")):
+        return await club_service.remove_members(token.get("club"), members.user_ids)
+    else:
+        raise HTTPException(status_code=401, detail="You are not authorized to remove this member")
+
 @club_router.get("/get/requests/all")
-async def get_all_membership_requests(token: dict = Depends(get_token_club)):
+async def get_all_membership_requests(token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
     if validate_founder_role(token.get("role")):
-        return club_service.get_club_requests(token.get("club"))
+        return await club_service.get_club_requests(token.get("club"))
     else:
         raise HTTPException(status_code=401, detail="You are not authorized to view membership requests")
 
 @club_router.patch("/membership/remove")
-async def remove_member(membership: UserID, token: dict = Depends(get_token_club)):
+async def remove_member(membership: UserID, token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
     if validate_founder_role(token.get("role")):
-        club_service.remove_member(token.get("club"), membership.id_user)
+        await club_service.remove_member(token.get("club"), membership.id_user)
         return {"message": "Member removed successfully"}
     else:
         raise HTTPException(status_code=401, detail="You are not authorized to remove this member")
@@ -114,97 +173,165 @@ async def upload_resource(title: str = Form(...),
                           biblio_ref: str = Form(...),
                           reading_res_desc: str = Form(...),
                           file: UploadFile = File(...),
-                          token: dict = Depends(get_token_club)):
+                          token: dict = Depends(get_token_club),
+                          resource_service: ResourceService = Depends(get_resource_service)):
     if validate_founder_role(token.get("role")):
         info = ResourceToUpload(title=title,
                                 author=author,
                                 biblio_ref=biblio_ref,
                                 reading_res_desc=reading_res_desc)
 
-        resource_service.upload_resource(info, token.get("club"),file)
-        return {"message": "Resource uploaded successfully"}
+        resource_id = await resource_service.upload_resource(info, token.get("club"), str(token.get("user")), file)
+        return {"message": "Resource uploaded successfully", "id_reading_resource": resource_id}
     else:
         raise HTTPException(status_code=400, detail="You are not authorized to upload a resource")
 
 @club_router.get("/get/resources/id/{resource_id}")
-async def get_resource(resource_id: int, token: dict = Depends(get_token_club)):
-    return resource_service.get_resource_url(resource_id)
+async def get_resource(resource_id: int, token: dict = Depends(get_token_club), resource_service: ResourceService = Depends(get_resource_service)):
+    return await resource_service.get_resource_url(resource_id)
 
 @club_router.patch("/delete/resources/{resource_id}")
-async def delete_resource(resource_id: int, token: dict = Depends(get_token_club)):
+async def delete_resource(resource_id: int, token: dict = Depends(get_token_club), resource_service: ResourceService = Depends(get_resource_service)):
     if validate_founder_role(token.get("role")):
-        resource_service.delete_resource(resource_id)
+        await resource_service.delete_resource(resource_id)
         return {"message": "Resource deleted successfully"}
     else:
         raise HTTPException(status_code=401, detail="You are not authorized to delete this resource")
 
 @club_router.get("/get/resources/all")
-async def get_all_resources_by_club(token: dict = Depends(get_token_club)):
-    return resource_service.get_all_resources_by_club(token.get("club"))
+async def get_all_resources_by_club(token: dict = Depends(get_token_club), resource_service: ResourceService = Depends(get_resource_service)):
+    return await resource_service.get_all_resources_by_club(token.get("club"))
+
+# La generación con la IA tarda decenas de segundos: se encola y se responde 202 con el trabajo
+def quiz_job_accepted(job):
+    return JSONResponse(status_code=202,
+                        content=jsonable_encoder(job.to_status()),
+                        headers={"Location": f"{club_router.prefix}/quiz/jobs/{job.job_id}"})
 
 @club_router.get("/get/resources/quiz/{resource_id}")
-async def get_quiz(resource_id: int, token: dict = Depends(get_token_club)):
+async def get_quiz(resource_id: int, token: dict = Depends(get_token_club), quiz_service: QuizService = Depends(get_quiz_service)):
     if validate_founder_role(token.get("role")):
-        return quiz_service.get_quiz(resource_id, str(token.get("user")))
+        quiz = await quiz_service.find_quiz(resource_id)
+        if quiz is not None:
+            return quiz
+        return quiz_job_accepted(await quiz_jobs.submit(resource_id, token.get("club"), str(token.get("user"))))
     if token.get("role") == "Member":
-        return quiz_service.get_quiz_from_db_for_members(resource_id)
+        return await quiz_service.get_quiz_from_db_for_members(resource_id)
     else:
         raise HTTPException(status_code=400, detail="Quiz does not exist or you are not authorized to view it")
 
 
+@club_router.get("/get/resources/quiz/{resource_id}/member", summary="Quiz for members with decoded questions and options")
+async def get_member_quiz(resource_id: int, request: Request, token: dict = Depends(get_token_club), quiz_service: QuizService = Depends(get_quiz_service)):
+    if token.get("role") != "Member":
+        raise HTTPException(status_code=400, detail="Quiz does not exist or you are not authorized to view it")
+    payload = await quiz_service.get_member_quiz_payload(resource_id)
+    return etag_response(request, payload.body, etag=payload.etag)
+
 @club_router.get("/regenerate/resources/quiz/{resource_id}")
-async def regenerate_quiz(resource_id: int, token: dict = Depends(get_token_club)):
+async def regenerate_quiz(resource_id: int, token: dict = Depends(get_token_club), quiz_service: QuizService = Depends(get_quiz_service)):
     if not validate_founder_role(token.get("role")):
         raise HTTPException(status_code=401, detail="You are not authorized to regenerate this quiz")
-    return quiz_service.regen_quiz(resource_id, str(token.get("user")))
+    return quiz_job_accepted(await quiz_jobs.submit(resource_id, token.get("club"), str(token.get("user")), regenerate=True))
+
+@club_router.get("/quiz/jobs/{job_id}", summary="Status and result of a quiz generation job")
+async def get_quiz_job(job_id: str, token: dict = Depends(get_token_club)):
+    # El resultado incluye las respuestas correctas: solo lo ve el founder
+    if not validate_founder_role(token.get("role")):
+        raise HTTPException(status_code=401, detail="You are not authorized to view this quiz job")
+    job = await quiz_jobs.get(job_id)
+    if job is None or job.id_club != token.get("club"):
+        raise HTTPException(status_code=404, detail="Quiz job not found")
+    return job.to_status()
 
 @club_router.post("/submit/quiz")
-async def submit_quiz(quiz_submit: QuizSubmit, token: dict = Depends(get_token_club)):
+async def submit_quiz(quiz_submit: QuizSubmit, token: dict = Depends(get_token_club), quiz_service: QuizService = Depends(get_quiz_service)):
     if token.get("role") == "Member":
-        return quiz_service.submit_quiz(quiz_submit, token.get("user"), token.get("club"), id_role=2)
+        return await quiz_service.submit_quiz(quiz_submit, token.get("user"), token.get("club"), id_role=2)
     else:
         raise HTTPException(status_code=401, detail="Only members can submit quizzes")
 
 
 @club_router.get("/get/member/medals")
-async def get_member_medals_by_club(token: dict = Depends(get_token_club)):
-    return club_service.get_member_medals_by_club(token.get("club"), token.get("user"))
+async def get_member_medals_by_club(token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_member_medals_by_club(token.get("club"), token.get("user"))
 
 @club_router.get("/get/user/medals/{user_id}")
-async def get_user_medals(user_id: int):
-    return club_service.get_user_medals(user_id)
+async def get_user_medals(user_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_user_medals(user_id)
+
+@club_router.post("/get/users/medals", summary="Medal summaries of many users at once")
+async def get_users_medals(users: UserIDs, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_users_medals(users.user_ids)
 
 @club_router.get("/ranking")
-async def get_ranking(token: dict = Depends(get_token_club)):
-    return club_service.get_club_ranking(token.get("club"))
+async def get_ranking(token: dict = Depends(get_token_club), club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_club_ranking(token.get("club"))
+
+@club_router.get("/ranking/top", summary="Top N members of the club ranking")
+async def get_ranking_top(n: int = Query(10, ge=1, le=100),
+                          token: dict = Depends(get_token_club),
+                          club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_club_ranking_top(token.get("club"), n)
+
+@club_router.get("/ranking/page/{page}", summary="One page of the club ranking")
+async def get_ranking_page(page: int = Path(ge=1),
+                           size: int = Query(20, ge=1, le=100),
+                           token: dict = Depends(get_token_club),
+                           club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_club_ranking_page(token.get("club"), page, size)
+
+@club_router.get("/ranking/me", summary="Rank of the current member and the members around them")
+async def get_my_rank(neighbours: int = Query(2, ge=0, le=25),
+                      token: dict = Depends(get_token_club),
+                      club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_member_rank(token.get("club"), token.get("user"), neighbours)
+
+@club_router.get("/ranking/global", summary="One page of the global ranking by global_score")
+async def get_global_ranking(page: int = Query(1, ge=1),
+                             size: int = Query(50, ge=1, le=200)):
+    return await global_ranking.get_page(page, size)
+
+@club_router.get("/ranking/global/{user_id}", summary="Global rank and percentile of a user")
+async def get_global_user_rank(user_id: int):
+    return await global_ranking.get_user_rank(user_id)
 
 @club_router.get("/get/resources/ranking/{resource_id}")
-async def get_ranking_by_resource(resource_id: int, token: dict = Depends(get_token_club)):
-    return resource_service.get_ranking_by_resource(resource_id)
+async def get_ranking_by_resource(resource_id: int, token: dict = Depends(get_token_club), resource_service: ResourceService = Depends(get_resource_service)):
+    return await resource_service.get_ranking_by_resource(resource_id)
 
 @club_router.get("/get/user/profile/{user_id}")
-async def get_user_profile(user_id: int):
-    return club_service.get_user_profile(user_id)
+async def get_user_profile(user_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.get_user_profile(user_id)
+
+@club_router.get("/get/user/full-profile/{user_id}", summary="Profile, completeness, club counts and medals of a user")
+async def get_user_full_profile(user_id: int, request: Request, club_service: ClubService = Depends(get_club_service)):
+    profile = await club_service.get_user_full_profile(user_id)
+    return etag_response(request, profile.model_dump_json().encode())
 
 @club_router.post("/update/user/profile")
-async def update_user_profile(info: ProfileInfoUp):
-    return club_service.update_user_profile(info)
+async def update_user_profile(info: ProfileInfoUp, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.update_user_profile(info)
 
 @club_router.get("/check/user/info/{user_id}")
-async def check_user_info(user_id: int):
-    return club_service.check_user_info(user_id)
+async def check_user_info(user_id: int, club_service: ClubService = Depends(get_club_service)):
+    return await club_service.check_user_info(user_id)
 
 @club_router.get("/check/resources/quiz/{id_quiz}")
-async def check_quiz_answered(id_quiz: int, token: dict = Depends(get_token_club)):
-    return quiz_service.check_quiz_answered(id_quiz, token.get("club"), token.get("user"))
+async def check_quiz_answered(id_quiz: int, token: dict = Depends(get_token_club), quiz_service: QuizService = Depends(get_quiz_service)):
+    return await quiz_service.check_quiz_answered(id_quiz, token.get("club"), token.get("user"))
 
 @club_router.get("/get/careers/all")
-async def get_all_careers():
-    return club_service.get_all_careers()
+async def get_all_careers(request: Request):
+    return etag_response(request, (await reference_data.get()).careers_json, REFERENCE_CACHE_CONTROL)
+
+@club_router.get("/get/medals/catalog", summary="Medal qualities with their medal type")
+async def get_medal_catalog(request: Request):
+    return etag_response(request, (await reference_data.get()).medal_catalog_json, REFERENCE_CACHE_CONTROL)
 
 #Soon........
 @club_router.put("/membership/leave")
-async def leave_club():
+async def leave_club(club_service: ClubService = Depends(get_club_service)):
     if not club_service.leave_club:
         raise HTTPException(status_code=400, detail="Error while leaving club")
     return {"message": "Left club successfully"}
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+
+from controllers.admin_controller import verify_admin_key
+from core.events import events
+from core.metrics import compile_cache_metrics, pool_metrics_snapshot
+from core.statement_cache import statements
+from services.ai_api_client import ai_api
+from services.club_cache_service import club_cache
+from services.club_service import verified_tokens
+from services.medal_summary_service import medal_summaries
+from services.member_quiz_cache_service import member_quizzes
+from services.quiz_job_service import quiz_jobs
+from services.quiz_service import answer_keys
+from services.score_pipeline_service import score_pipeline
+
+# Expone detalles internos (pool, cachés, colas): misma clave que /admin
+metrics_router = APIRouter(prefix="/metrics", tags=["Metrics"], dependencies=[Depends(verify_admin_key)])
+
+@metrics_router.get("/pool", summary="Connection pool usage and checkout wait times")
+async def get_pool_metrics():
+    return pool_metrics_snapshot()
+
+@metrics_router.get("/statements", summary="Compiled SQL cache hits and misses")
+async def get_statement_metrics():
+    return {"prebuilt_statements": len(statements), "compile_cache": compile_cache_metrics.snapshot()}
+
+@metrics_router.get("/caches", summary="Hit ratios of the in-process caches")
+async def get_cache_metrics():
+    return {
+        "verified_tokens": verified_tokens.claims.stats(),
+        "clubs_by_id": club_cache.by_id.stats(),
+        "club_codes": club_cache.code_index.stats(),
+        "member_quizzes": member_quizzes.payloads.stats(),
+        "answer_keys": answer_keys.stats(),
+        "medals_by_user": medal_summaries.by_user.stats(),
+        "medals_by_club_user": medal_summaries.by_club_user.stats(),
+    }
+
+@metrics_router.get("/jobs", summary="Quiz generation queue depth and outcomes")
+async def get_job_metrics():
+    return {"quiz_generation": quiz_jobs.stats(), "ai_api": ai_api.stats()}
+
+@metrics_router.get("/events", summary="Score pipeline throughput and lag behind quiz submissions")
+async def get_event_metrics():
+    return {"published_total": events.published, "dropped_total": events.dropped, "score_pipeline": score_pipeline.stats()}
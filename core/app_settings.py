@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,6 +16,80 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str
     AWS_BUCKET_NAME: str
     AI_API_URL:str
+    # Cliente HTTP de la API de IA: la generación tarda decenas de segundos
+    AI_API_CONNECT_TIMEOUT: float = 5.0
+    AI_API_READ_TIMEOUT: float = 90.0
+    AI_API_MAX_CONCURRENCY: int = 4
+    AI_API_QUEUE_TIMEOUT: float = 10.0
+    AI_API_MAX_RETRIES: int = 2
+    AI_API_RETRY_BACKOFF_SECONDS: float = 1.0
+    AI_API_BREAKER_FAILURES: int = 5
+    AI_API_BREAKER_RESET_SECONDS: float = 30.0
+    # Pool de conexiones a MySQL (por worker)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800  # segundos; debe ser menor que wait_timeout de MySQL
+    DB_POOL_PRE_PING: bool = True
+    DB_QUERY_CACHE_SIZE: int = 1200  # entradas del caché de SQL compilado por engine
+    # "snapshot" carga el esquema desde disco; "reflect" lo refleja de la BD tabla por tabla
+    SCHEMA_SOURCE: str = "snapshot"
+    SCHEMA_SNAPSHOT_PATH: str = "core/schema_snapshot.pickle"
+    # Réplica de lectura (mismo usuario y base); sin host todas las consultas van al primario
+    MYSQL_REPLICA_HOST: Optional[str] = None
+    MYSQL_REPLICA_PORT: Optional[int] = None
+    # Segundos que las lecturas de un cliente van al primario después de que escribió (cookie/header)
+    REPLICA_STICKY_SECONDS: int = 5
+    # Segundos antes de recargar desde MySQL el ranking en memoria de un club
+    LEADERBOARD_MAX_AGE_SECONDS: int = 300
+    # Cada cuántos segundos se recalcula el ranking global a partir de users.global_score
+    GLOBAL_RANKING_REFRESH_SECONDS: int = 60
+    # Caché de resúmenes de medallas por usuario y por (club, usuario)
+    MEDAL_SUMMARY_CACHE_SIZE: int = 20000
+    MEDAL_SUMMARY_TTL_SECONDS: int = 600
+    # Cola de generación de quizzes con la IA (workers dentro de cada proceso; el estado va a quiz_jobs)
+    QUIZ_JOB_WORKERS: int = 2
+    QUIZ_JOB_RETENTION_SECONDS: int = 86400
+    # Al arrancar, los trabajos sin terminar con más de estos segundos se marcan como fallidos
+    # (su worker se cayó); debe superar lo que puede esperar un trabajo en la cola de fondo
+    QUIZ_JOB_ABANDONED_SECONDS: int = 3600
+    # Pre-generación del quiz apenas se sube un recurso. Con prioridad mayor que 0 los trabajos
+    # van a una cola de fondo con sus propios workers y no demoran a un founder que espera
+    QUIZ_PREGENERATE_ON_UPLOAD: bool = False
+    QUIZ_PREGENERATE_WORKERS: int = 1
+    QUIZ_PREGENERATE_PRIORITY: int = 10
+    # Caché de quizzes ya serializados para miembros
+    MEMBER_QUIZ_CACHE_SIZE: int = 2000
+    MEMBER_QUIZ_CACHE_TTL_SECONDS: int = 600
+    # Caché de respuestas correctas por id_quiz
+    ANSWER_KEY_CACHE_SIZE: int = 5000
+    ANSWER_KEY_CACHE_TTL_SECONDS: int = 3600
+    # Pipeline que aplica por lotes los puntajes y medallas derivados de cada envío de quiz
+    SCORE_PIPELINE_BATCH_SIZE: int = 200
+    SCORE_PIPELINE_BATCH_WAIT_SECONDS: float = 0.5
+    SCORE_PIPELINE_MAX_ATTEMPTS: int = 5
+    SCORE_PIPELINE_QUEUE_SIZE: int = 100000
+    SCORE_PIPELINE_DRAIN_SECONDS: float = 10.0
+    # Cada cuánto se aplican los resultados que quedaron pendientes (eventos descartados o perdidos)
+    SCORE_PIPELINE_SWEEP_SECONDS: float = 300.0
+    # Reglas de medallas en JSON, p. ej.
+    # [{"counter": "quantity_perfect_quizzes", "threshold": 1, "id_medal_quality": 1}]
+    MEDAL_RULES: List[dict] = []
+    # Filas de quiz_results por UPDATE (executemany) al re-calificar un quiz regenerado
+    RESCORE_BATCH_SIZE: int = 1000
+    # Caché de tokens JWT ya verificados (cada entrada vence con el exp del token)
+    JWT_CACHE_SIZE: int = 10000
+    JWT_CACHE_MAX_TTL_SECONDS: int = 3600
+    # Caché de clubes por id_club / club_code
+    CLUB_CACHE_SIZE: int = 5000
+    CLUB_CACHE_TTL_SECONDS: int = 300
+    # Intentos de insertar un club con un código aleatorio distinto antes de rendirse
+    CLUB_CODE_MAX_ATTEMPTS: int = 5
+    # Datos de referencia (carreras, tipos y calidades de medallas) que se cargan al arrancar
+    REFERENCE_DATA_TTL_SECONDS: int = 3600
+    REFERENCE_DATA_HTTP_MAX_AGE: int = 3600
+    # Clave del header X-Admin-Key para los endpoints de administración (deshabilitados si no se define)
+    ADMIN_API_KEY: Optional[str] = None
     model_config = SettingsConfigDict(env_file="core/.env")
 
 
@@ -1,26 +1,159 @@
+import logging
+import os
+import time
+
+from fastapi import Request
 from core.app_settings import get_settings # Modifica model para prueba aqui
+from core.metrics import InstrumentedAsyncQueuePool, compile_cache_metrics, instrument_engine
+from core.schema_snapshot import load_snapshot
 from sqlalchemy import Table, create_engine, MetaData
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session
 settings = get_settings()
 
-engine = create_engine(f"mysql+mysqlconnector://{settings.MYSQL_DB_USERNAME}:{settings.MYSQL_DB_PASSWORD}@{settings.MYSQL_DB_HOST}:{settings.MYSQL_DB_PORT}/{settings.MYSQL_DB_NAME}")
+# Engine síncrono: solo para herramientas (snapshot del esquema) y reflexión puntual de tablas
+engine = create_engine(f"mysql+mysqlconnector://{settings.MYSQL_DB_USERNAME}:{settings.MYSQL_DB_PASSWORD}@{settings.MYSQL_DB_HOST}:{settings.MYSQL_DB_PORT}/{settings.MYSQL_DB_NAME}",
+                       pool_recycle=settings.DB_POOL_RECYCLE,
+                       pool_pre_ping=settings.DB_POOL_PRE_PING)
+
+# Engine asíncrono que usan los repositorios desde los endpoints
+async_engine = create_async_engine(f"mysql+aiomysql://{settings.MYSQL_DB_USERNAME}:{settings.MYSQL_DB_PASSWORD}@{settings.MYSQL_DB_HOST}:{settings.MYSQL_DB_PORT}/{settings.MYSQL_DB_NAME}",
+                                   poolclass=InstrumentedAsyncQueuePool,
+                                   pool_size=settings.DB_POOL_SIZE,
+                                   max_overflow=settings.DB_MAX_OVERFLOW,
+                                   pool_timeout=settings.DB_POOL_TIMEOUT,
+                                   pool_recycle=settings.DB_POOL_RECYCLE,
+                                   pool_pre_ping=settings.DB_POOL_PRE_PING,
+                                   query_cache_size=settings.DB_QUERY_CACHE_SIZE)
+instrument_engine(async_engine.sync_engine, "primary")
+compile_cache_metrics.attach(async_engine.sync_engine)
+
+# Réplica de lectura opcional, con la misma configuración de pool
+replica_engine = None
+if settings.MYSQL_REPLICA_HOST:
+    replica_engine = create_async_engine(f"mysql+aiomysql://{settings.MYSQL_DB_USERNAME}:{settings.MYSQL_DB_PASSWORD}@{settings.MYSQL_REPLICA_HOST}:{settings.MYSQL_REPLICA_PORT or settings.MYSQL_DB_PORT}/{settings.MYSQL_DB_NAME}",
+                                         poolclass=InstrumentedAsyncQueuePool,
+                                         pool_size=settings.DB_POOL_SIZE,
+                                         max_overflow=settings.DB_MAX_OVERFLOW,
+                                         pool_timeout=settings.DB_POOL_TIMEOUT,
+                                         pool_recycle=settings.DB_POOL_RECYCLE,
+                                         pool_pre_ping=settings.DB_POOL_PRE_PING,
+                                         query_cache_size=settings.DB_QUERY_CACHE_SIZE)
+    instrument_engine(replica_engine.sync_engine, "replica")
+    compile_cache_metrics.attach(replica_engine.sync_engine)
+
+
+class RoutingSession(Session):
+    """Envía los SELECT a la réplica y todo lo demás al primario.
+
+    Después de la primera escritura (o si la sesión se abrió con use_primary)
+    todas las consultas de la sesión van al primario para leer lo que se escribió.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # is_select cubre Select y CompoundSelect (UNION); un SELECT ... FOR UPDATE no es solo lectura
+        is_read = getattr(clause, "is_select", False) and getattr(clause, "_for_update_arg", None) is None
+        if replica_engine is not None and not self.info.get("use_primary") \
+                and not self._flushing and is_read:
+            return replica_engine.sync_engine
+        if clause is not None and not is_read:
+            self.info["use_primary"] = True
+            # Solo INSERT/UPDATE/DELETE marcan al usuario como "escribió" (stickiness en get_db)
+            if getattr(clause, "is_dml", False):
+                self.info["wrote"] = True
+        return async_engine.sync_engine
+
+
+async_session = async_sessionmaker(async_engine, sync_session_class=RoutingSession, expire_on_commit=False)
 
 # Se crean los modelos que estan mapeados en python
 #database_models.Base.metadata.create_all(bind = engine)
 metadata = MetaData()
-# Crea un ob
-# Refleja las tablas existentes
-metadata.reflect(bind=engine)
+_snapshot_loaded = False
+logger = logging.getLogger(__name__)
+
+# Carga el snapshot del esquema (python -m core.schema_snapshot generate) sin tocar la BD
+def _load_schema_snapshot():
+    global _snapshot_loaded
+    _snapshot_loaded = True
+    if not os.path.exists(settings.SCHEMA_SNAPSHOT_PATH):
+        logger.warning("Schema snapshot %s not found, reflecting tables on demand", settings.SCHEMA_SNAPSHOT_PATH)
+        return
+    for table in load_snapshot(settings.SCHEMA_SNAPSHOT_PATH).tables.values():
+        table.to_metadata(metadata)
 
+# Las tablas se resuelven la primera vez que se piden: desde el snapshot o, si no
+# están en él (o SCHEMA_SOURCE=reflect), reflejando solo esa tabla
 def get_table(table_name):
+    if table_name not in metadata.tables:
+        if settings.SCHEMA_SOURCE == "snapshot" and not _snapshot_loaded:
+            _load_schema_snapshot()
+        if table_name not in metadata.tables:
+            Table(table_name, metadata, autoload_with=engine, resolve_fks=False)
     return metadata.tables[table_name]
 
 def get_engine():
     return engine
 
-def get_db():
-    db = Session(engine)
+def get_async_engine():
+    return async_engine
+
+# Marca de "leer lo que escribí": get_db la devuelve al cliente (cookie y header) después de una
+# escritura y, mientras no venza, cualquier worker manda las lecturas de ese cliente al primario
+READ_PRIMARY_COOKIE = "read_primary_until"
+READ_PRIMARY_HEADER = "X-Read-Primary-Until"
+
+# True si el request trae una marca vigente. Solo decide el enrutamiento, no autoriza nada
+def _reads_from_primary(request: Request) -> bool:
+    until = request.cookies.get(READ_PRIMARY_COOKIE) or request.headers.get(READ_PRIMARY_HEADER)
+    try:
+        return float(until) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+# Middleware: agrega a la respuesta la marca que dejó get_db (también si la ruta devolvió su propio Response)
+async def read_primary_marker(request: Request, call_next):
+    response = await call_next(request)
+    until = getattr(request.state, "read_primary_until", None)
+    if until is not None:
+        response.set_cookie(READ_PRIMARY_COOKIE, f"{until:.3f}", max_age=settings.REPLICA_STICKY_SECONDS,
+                            httponly=True, samesite="lax")
+        response.headers[READ_PRIMARY_HEADER] = f"{until:.3f}"
+    return response
+
+# Código de error de MySQL para una clave única duplicada
+ER_DUP_ENTRY = 1062
+
+# True si el IntegrityError es una clave duplicada (1062) y, si se indica, del índice constraint.
+# MySQL solo deshace la sentencia que falló: la transacción del request sigue válida
+def is_duplicate_key(error, constraint=None):
+    args = getattr(error.orig, "args", ())
+    if not args or args[0] != ER_DUP_ENTRY:
+        return False
+    return constraint is None or constraint in str(args[-1])
+
+# Registra una función a ejecutar solo si el commit del request sale bien
+# (p. ej. actualizar cachés en memoria con lo que se acaba de escribir)
+def run_after_commit(db, callback):
+    db.info.setdefault("after_commit", []).append(callback)
+
+# Commit de la sesión y, si salió bien, los callbacks registrados con run_after_commit
+async def commit(db):
+    await db.commit()
+    for callback in db.info.pop("after_commit", []):
+        callback()
+
+# Una sola sesión por request: todos los repositorios de la petición la comparten
+# y se hace un único commit al final (o rollback si algo falló)
+async def get_db(request: Request):
+    db = async_session(info={"use_primary": _reads_from_primary(request)})
     try:
         yield db
+        await commit(db)
+        if db.info.get("wrote") and replica_engine is not None:
+            request.state.read_primary_until = time.time() + settings.REPLICA_STICKY_SECONDS
+    except Exception:
+        await db.rollback()
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
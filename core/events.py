@@ -0,0 +1,36 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """Bus de eventos en memoria del proceso.
+
+    publish() nunca bloquea al request: deja el evento en la cola de cada
+    suscriptor de ese tipo. Si una cola está llena el evento se descarta y se
+    cuenta en dropped. Los eventos viven solo en memoria: si el proceso muere
+    antes de consumirlos se pierden.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, event_type, maxsize: int = 0) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize)
+        self._queues.setdefault(event_type, []).append(queue)
+        return queue
+
+    def publish(self, event):
+        self.published += 1
+        for queue in self._queues.get(type(event), []):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                logger.error("Event queue full, dropping %s", event)
+
+
+events = EventBus()
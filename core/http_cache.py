@@ -0,0 +1,27 @@
+import hashlib
+
+from fastapi import Request, Response
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Se aceptan listas de ETags y ETags débiles (W/"...")
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return etag in candidates
+
+
+# Responde el JSON ya serializado con su ETag, o un 304 vacío si el cliente ya tiene esa versión
+def etag_response(request: Request, body: bytes, cache_control: str = "private, no-cache", etag: str = None) -> Response:
+    etag = etag or make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
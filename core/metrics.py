@@ -0,0 +1,165 @@
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Límites (en segundos) de los buckets del histograma de espera al pedir una conexión
+CHECKOUT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=CHECKOUT_WAIT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # el último bucket es +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            # Buckets acumulados al estilo Prometheus (le = "less or equal")
+            cumulative = []
+            total = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), self._counts):
+                total += bucket_count
+                cumulative.append({"le": "+Inf" if bound == float("inf") else bound, "count": total})
+            return {"count": self._count, "sum": round(self._sum, 6), "buckets": cumulative}
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.checkout_wait = Histogram()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.checkout_errors = 0
+
+    def attach(self, pool):
+        self.pool = pool
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        data = {
+            "name": self.name,
+            "checkouts_total": self.checkouts,
+            "checkins_total": self.checkins,
+            "connects_total": self.connects,
+            "invalidations_total": self.invalidations,
+            "checkout_errors_total": self.checkout_errors,
+            "checkout_wait_seconds": self.checkout_wait.snapshot(),
+        }
+        if self.pool is not None:
+            data.update({
+                "pool_size": self.pool.size(),
+                "checked_out": self.pool.checkedout(),
+                "idle": self.pool.checkedin(),
+                # overflow() es negativo mientras el pool base no se ha llenado
+                "overflow": max(self.pool.overflow(), 0),
+            })
+        return data
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Mide cuánto espera cada checkout antes de obtener una conexión del pool."""
+
+    _metrics: PoolMetrics = None
+
+    def recreate(self):
+        # Los listeners se copian al pool nuevo; solo hay que apuntar las métricas a él
+        pool = super().recreate()
+        pool._metrics = self._metrics
+        if self._metrics is not None:
+            self._metrics.pool = pool
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            if self._metrics is not None:
+                self._metrics.checkout_errors += 1
+            raise
+        finally:
+            if self._metrics is not None:
+                self._metrics.checkout_wait.observe(time.perf_counter() - started)
+
+
+class CompileCacheMetrics:
+    """Cuenta aciertos y fallos del caché de SQL compilado de SQLAlchemy."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is None:
+            return
+        if context.cache_hit is CACHE_HIT:
+            self.hits += 1
+        elif context.cache_hit is CACHE_MISS:
+            self.misses += 1
+        else:
+            self.uncached += 1
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits_total": self.hits,
+            "misses_total": self.misses,
+            "uncached_total": self.uncached,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+compile_cache_metrics = CompileCacheMetrics()
+_pool_metrics = {}
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    if name not in _pool_metrics:
+        _pool_metrics[name] = PoolMetrics(name)
+    return _pool_metrics[name]
+
+
+# Registra las métricas del pool de un engine creado con un pool Instrumented*
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    metrics = get_pool_metrics(name)
+    engine.pool._metrics = metrics
+    metrics.attach(engine.pool)
+    return metrics
+
+
+def pool_metrics_snapshot() -> list:
+    return [metrics.snapshot() for metrics in _pool_metrics.values()]
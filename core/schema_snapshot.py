@@ -0,0 +1,111 @@
+"""Snapshot serializado del esquema para no reflejar la base de datos al arrancar.
+
+Uso:
+    python -m core.schema_snapshot generate   # regenera el snapshot desde la BD
+    python -m core.schema_snapshot check      # compara el snapshot con la BD (exit 1 si hay drift)
+"""
+import argparse
+import pickle
+import sys
+from pathlib import Path
+
+from sqlalchemy import MetaData
+
+# Tablas que usan los repositorios vía get_table; solo estas se guardan en el snapshot
+SNAPSHOT_TABLES = (
+    'careers',
+    'club_requests',
+    'clubs',
+    'medal_qualities',
+    'medal_types',
+    'medals_awarded',
+    'participant_role_club',
+    'quiz_jobs',
+    'quiz_results',
+    'quizzez',
+    'reading_resources',
+    'users',
+)
+
+
+def reflect_tables(engine, tables=SNAPSHOT_TABLES) -> MetaData:
+    metadata = MetaData()
+    # resolve_fks=False evita que la reflexión arrastre tablas que no usamos
+    metadata.reflect(bind=engine, only=list(tables), resolve_fks=False)
+    return metadata
+
+
+def save_snapshot(metadata: MetaData, path: str):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as file:
+        pickle.dump(metadata, file)
+
+
+def load_snapshot(path: str) -> MetaData:
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+def describe_table(table, dialect) -> dict:
+    return {
+        column.name: {
+            "type": column.type.compile(dialect=dialect),
+            "nullable": column.nullable,
+            "primary_key": column.primary_key,
+        }
+        for column in table.columns
+    }
+
+
+def find_drift(snapshot: MetaData, live: MetaData, dialect) -> list:
+    problems = []
+    for name in SNAPSHOT_TABLES:
+        if name not in snapshot.tables:
+            problems.append(f"{name}: missing from snapshot")
+            continue
+        if name not in live.tables:
+            problems.append(f"{name}: missing from database")
+            continue
+        expected = describe_table(snapshot.tables[name], dialect)
+        actual = describe_table(live.tables[name], dialect)
+        for column in sorted(expected.keys() - actual.keys()):
+            problems.append(f"{name}.{column}: dropped from database")
+        for column in sorted(actual.keys() - expected.keys()):
+            problems.append(f"{name}.{column}: added in database")
+        for column in sorted(expected.keys() & actual.keys()):
+            if expected[column] != actual[column]:
+                problems.append(f"{name}.{column}: snapshot {expected[column]} != database {actual[column]}")
+    return problems
+
+
+def main(argv=None):
+    from core.app_settings import get_settings
+    from core.database import get_engine
+
+    parser = argparse.ArgumentParser(prog="python -m core.schema_snapshot")
+    parser.add_argument("command", choices=["generate", "check"])
+    parser.add_argument("--path", default=get_settings().SCHEMA_SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    live = reflect_tables(engine)
+    if args.command == "generate":
+        save_snapshot(live, args.path)
+        print(f"Schema snapshot with {len(live.tables)} tables written to {args.path}")
+        return 0
+
+    if not Path(args.path).exists():
+        print(f"Schema snapshot not found at {args.path}")
+        return 1
+    problems = find_drift(load_snapshot(args.path), live, engine.dialect)
+    for problem in problems:
+        print(problem)
+    if problems:
+        print("Schema snapshot is out of date, run: python -m core.schema_snapshot generate")
+        return 1
+    print("Schema snapshot matches the database")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+from threading import Lock
+
+
+class StatementCache:
+    """Sentencias de las consultas más frecuentes, construidas una sola vez por proceso.
+
+    Se guardan con bindparam() en vez de valores literales, así cada llamada reutiliza
+    el mismo objeto (y su entrada en el caché de compilación de SQLAlchemy) y solo
+    cambia los parámetros.
+    """
+
+    def __init__(self):
+        self._statements = {}
+        self._lock = Lock()
+
+    def get(self, key: str, build):
+        statement = self._statements.get(key)
+        if statement is None:
+            with self._lock:
+                statement = self._statements.get(key)
+                if statement is None:
+                    statement = self._statements[key] = build()
+        return statement
+
+    def __len__(self):
+        return len(self._statements)
+
+
+statements = StatementCache()
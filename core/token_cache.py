@@ -0,0 +1,30 @@
+import hashlib
+import time
+
+from core.cache import TTLCache
+
+
+class VerifiedTokenCache:
+    """Claims de tokens JWT ya verificados, indexados por el sha256 del token.
+
+    Cada entrada vence cuando vence el token (claim exp), nunca después de
+    max_ttl_seconds. Solo se guardan tokens que pasaron la verificación completa.
+    """
+
+    def __init__(self, maxsize: int, max_ttl_seconds: int):
+        self.max_ttl_seconds = max_ttl_seconds
+        self.claims = TTLCache(maxsize, max_ttl_seconds)
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        return self.claims.get(self._key(token))
+
+    def set(self, token: str, claims: dict, exp=None):
+        ttl_seconds = self.max_ttl_seconds
+        if exp is not None:
+            ttl_seconds = min(ttl_seconds, float(exp) - time.time())
+        if ttl_seconds > 0:
+            self.claims.set(self._key(token), claims, ttl_seconds)
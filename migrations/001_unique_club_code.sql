@@ -0,0 +1,7 @@
+-- Índice único sobre clubs.club_code.
+-- create_club ya no consulta si el código existe: inserta directamente y, si el
+-- índice rechaza el código, reintenta con otro (ver CLUB_CODE_MAX_ATTEMPTS).
+--
+-- Antes de aplicarlo, verificar que no haya códigos repetidos:
+--   SELECT club_code, COUNT(*) FROM clubs GROUP BY club_code HAVING COUNT(*) > 1;
+ALTER TABLE clubs ADD CONSTRAINT uq_clubs_club_code UNIQUE (club_code);
@@ -0,0 +1,8 @@
+-- Un solo resultado por (id_user, id_club, id_quiz).
+-- submit_quiz inserta sin consultar antes y, si el índice rechaza la fila (error 1062), devuelve
+-- el resultado que ya existía: los reintentos y envíos dobles del cliente son idempotentes.
+--
+-- Antes de aplicarlo, verificar que no haya resultados repetidos:
+--   SELECT id_user, id_club, id_quiz, COUNT(*) FROM quiz_results
+--   GROUP BY id_user, id_club, id_quiz HAVING COUNT(*) > 1;
+ALTER TABLE quiz_results ADD CONSTRAINT uq_quiz_results_user_club_quiz UNIQUE (id_user, id_club, id_quiz);
@@ -0,0 +1,8 @@
+-- Respuestas enviadas en cada resultado (lista JSON en el mismo orden de las preguntas).
+-- Al regenerar un quiz, QuizService.rescore_quiz vuelve a calificar con ellas todos los
+-- resultados guardados. Los resultados anteriores a esta migración quedan con NULL y
+-- conservan su puntaje original.
+--
+-- Después de aplicarlo, regenerar el snapshot del esquema:
+--   python -m core.schema_snapshot generate
+ALTER TABLE quiz_results ADD COLUMN answers TEXT NULL;
@@ -0,0 +1,20 @@
+-- Estado de los trabajos de generación de quizzes (services/quiz_job_service).
+-- La cola vive en memoria del proceso que recibió el pedido, pero el estado se guarda
+-- aquí para que GET /club/quiz/jobs/{job_id} responda desde cualquier worker.
+-- Los trabajos terminados se borran después de QUIZ_JOB_RETENTION_SECONDS.
+--
+-- Después de aplicarlo, regenerar el snapshot del esquema:
+--   python -m core.schema_snapshot generate
+CREATE TABLE quiz_jobs (
+    job_id CHAR(32) NOT NULL PRIMARY KEY,
+    resource_id INT NOT NULL,
+    id_club INT NOT NULL,
+    regenerate TINYINT(1) NOT NULL DEFAULT 0,
+    status VARCHAR(10) NOT NULL,
+    error VARCHAR(500) NULL,
+    result MEDIUMTEXT NULL,
+    created_at DATETIME(6) NOT NULL,
+    started_at DATETIME(6) NULL,
+    finished_at DATETIME(6) NULL,
+    KEY ix_quiz_jobs_finished_at (finished_at)
+);
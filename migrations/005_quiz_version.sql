@@ -0,0 +1,7 @@
+-- Versión del quiz: regen_quiz la incrementa cada vez que reemplaza preguntas y respuestas.
+-- Los cachés en memoria (quizzes para miembros, claves de respuestas) usan (quiz, versión)
+-- como clave, así ningún worker sirve ni califica con una versión anterior después de regenerar.
+--
+-- Después de aplicarlo, regenerar el snapshot del esquema:
+--   python -m core.schema_snapshot generate
+ALTER TABLE quizzez ADD COLUMN version INT NOT NULL DEFAULT 1;
@@ -0,0 +1,5 @@
+-- Índice por id_quiz para re-calificar al regenerar un quiz.
+-- rescore_quiz lee los resultados del quiz con SELECT ... FOR UPDATE: con este índice solo
+-- bloquea las filas (y huecos) de ese quiz y no recorre ni bloquea toda la tabla.
+-- Si quiz_results.id_quiz ya tiene una FK, InnoDB creó un índice equivalente y este se puede omitir.
+CREATE INDEX ix_quiz_results_id_quiz ON quiz_results (id_quiz);
@@ -0,0 +1,11 @@
+-- Un solo quiz por recurso.
+-- La cola de generación solo une pedidos repetidos dentro de un proceso: con varios workers
+-- dos trabajos pueden generar el mismo recurso a la vez. El índice rechaza el segundo
+-- INSERT (error 1062) y ese trabajo devuelve el quiz que ya quedó guardado.
+--
+-- Antes de aplicarlo, verificar que no haya quizzes repetidos:
+--   SELECT id_reading_resource, COUNT(*) FROM quizzez GROUP BY id_reading_resource HAVING COUNT(*) > 1;
+--
+-- Después de aplicarlo, regenerar el snapshot del esquema:
+--   python -m core.schema_snapshot generate
+ALTER TABLE quizzez ADD CONSTRAINT uq_quizzez_id_reading_resource UNIQUE (id_reading_resource);
@@ -0,0 +1,22 @@
+-- Lo que cada resultado ya sumó a los totales (services/score_pipeline_service).
+-- score_pipeline suma a participant_role_club y users la diferencia entre score y applied_score
+-- y guarda applied_score/applied_perfect en la misma transacción: reintentar un lote, incluso
+-- tras un COMMIT dudoso, no suma dos veces. score_pending = 1 marca los resultados con algo por
+-- aplicar (envío nuevo o re-cálculo); el barrido del pipeline aplica los que quedaron pendientes
+-- porque su evento se descartó o se perdió en una caída.
+--
+-- Los resultados existentes ya están sumados en los totales: se marcan como aplicados.
+-- Aplicarlo con los workers detenidos (al apagar, el pipeline anterior aplica su cola).
+--
+-- Después de aplicarlo, regenerar el snapshot del esquema:
+--   python -m core.schema_snapshot generate
+ALTER TABLE quiz_results
+    ADD COLUMN applied_score FLOAT NULL,
+    ADD COLUMN applied_perfect TINYINT(1) NULL,
+    ADD COLUMN score_pending TINYINT(1) NOT NULL DEFAULT 0,
+    ADD INDEX ix_quiz_results_score_pending (score_pending);
+
+UPDATE quiz_results r
+LEFT JOIN quizzez q ON q.id_quiz = r.id_quiz
+SET r.applied_score = r.score,
+    r.applied_perfect = (r.quantity_correct_answers = q.quantity_questions);
@@ -1,7 +1,8 @@
+from datetime import datetime
 from decimal import Decimal
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, Float
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -36,6 +37,29 @@ class Club(Base):
     created_at = Column(String(50))
     club_status = Column(String(1))
 
+class ClubInfo(BaseModel):
+    id_club: int
+    club_code: str
+    club_name: str
+    club_desc: Optional[str]
+    is_private: bool
+    is_academic: bool
+
+class ClubPage(BaseModel):
+    items: List[ClubInfo]
+    next_cursor: Optional[int]
+
+class MyClub(ClubInfo):
+    id_role: Optional[int]
+    id_request_status: Optional[int]
+    request_date: Optional[str]
+
+class MyClubs(BaseModel):
+    founded: List[MyClub]
+    joined: List[MyClub]
+    pending: List[MyClub]
+    rejected: List[MyClub]
+
 class ResourceToUpload(BaseModel):
     title: str
     author : str
@@ -117,6 +141,7 @@ class QuizCompare(BaseModel):
     correct_answers: List[str]
     minutes_to_answer: int
     quantity_questions: int
+    version: int
 
 class QuizResponse(BaseModel):
     correct_answers: List[str]
@@ -144,6 +169,7 @@ class QuizMember(BaseModel):
     quantity_questions: int
     minutes_to_answer: int
     id_reading_resource: int
+    version: int
 
 class QuizDB(Base):
     __tablename__ = "quizzez"
@@ -155,12 +181,42 @@ class QuizDB(Base):
     quantity_questions = Column(Integer)
     minutes_to_answer = Column(Integer)
     id_reading_resource = Column(Integer)
+    version = Column(Integer)
 
 class ClubRanking(BaseModel):
     id_user: int
     user_name: str
     total_score: float
 
+class RankedMember(ClubRanking):
+    rank: int
+
+class MyRank(BaseModel):
+    rank: Optional[int]
+    total_members: int
+    neighbours: List[RankedMember]
+
+class GlobalRankEntry(BaseModel):
+    rank: int
+    id_user: int
+    user_name: str
+    global_score: float
+
+class GlobalRankingPage(BaseModel):
+    entries: List[GlobalRankEntry]
+    total_users: int
+    as_of: datetime
+    staleness_seconds: float
+
+class GlobalUserRank(BaseModel):
+    id_user: int
+    rank: Optional[int]
+    percentile: Optional[float]
+    global_score: Optional[float]
+    total_users: int
+    as_of: datetime
+    staleness_seconds: float
+
 class ResourceRanking(BaseModel):
     id_user: int
     user_name: str
@@ -175,6 +231,52 @@ class MedalsByUser(BaseModel):
     medal_q_name: str
     quantity: int
 
+class MedalCatalogEntry(BaseModel):
+    id_medal_quality: int
+    medal_q_name: str
+    id_medal_type: int
+    medal_type_name: str
+
+class UserIDs(BaseModel):
+    user_ids: List[int] = Field(max_length=200)
+
+class BulkUserIDs(BaseModel):
+    user_ids: List[int] = Field(min_length=1, max_length=500)
+
+class MembershipOutcome(BaseModel):
+    id_user: int
+    status: str  # approved, rejected, added, removed, not_pending, already_member, not_member
+
+class BulkMembershipResult(BaseModel):
+    results: List[MembershipOutcome]
+
+class QuizJobStatus(BaseModel):
+    job_id: str
+    resource_id: int
+    regenerate: bool
+    status: str  # queued, running, succeeded, failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[dict] = None
+
+class UserProfile(BaseModel):
+    id_user: int
+    user_name: str
+    real_name: Optional[str]
+    phone_number: Optional[str]
+    semester: Optional[int]
+    id_career: Optional[int]
+    career_name: Optional[str]
+    sex: Optional[str]
+    global_score: Decimal
+    complete: bool
+    clubs_founded: int
+    clubs_joined: int
+    pending_requests: int
+    medals: List[MedalsByUser] = []
+
 class QuizResult(Base):
     __tablename__ = "quiz_results"
 
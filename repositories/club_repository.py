@@ -1,17 +1,19 @@
-from typing import Optional
-from fastapi import HTTPException, Depends
-from sqlalchemy import and_, or_
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import String, and_, bindparam, cast, exists, null, or_, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.functions import count
 from starlette.responses import JSONResponse
 
-from core.database import get_table, get_db
-from models.responses import NewClub, UpdateClub, Club, ClubRequest, ClubParticipant, ClubRanking, MedalsByUser, \
-    MedalsByClub, ProfileInfoUp, ProfileInfo, Career
+from core.database import get_table, is_duplicate_key
+from core.statement_cache import statements
+from models.responses import NewClub, UpdateClub, Club, ClubRequest, ClubParticipant, ClubRanking, UserProfile, \
+    ProfileInfoUp, ProfileInfo, Career, ClubInfo, ClubPage, MyClub, MyClubs, MedalCatalogEntry
 
 
 class ClubRepository:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.clubs_table = get_table('clubs')  # Obtiene la tabla de usuarios
         self.participants_table = get_table('participant_role_club')  # Obtiene la tabla de participantes de un club
@@ -22,33 +24,35 @@ class ClubRepository:
         self.medal_types = get_table('medal_types')  # Obtiene la tabla de tipos de medallas
         self.careers = get_table('careers')  # Obtiene la tabla de carreras
 
-    def _get_db(self) -> Session:
-        db = next(get_db())  # Obtiene la sesión usando el generador
-        return db
-
-    def create_club(self, newclub: NewClub, club_code: str):
-        db = self._get_db()
+    # Inserta el club (sin el fundador) y devuelve su id_club. Usa el primer código de
+    # club_codes que no choque con el índice único uq_clubs_club_code
+    # (migrations/001_unique_club_code.sql). Un código repetido solo deshace ese INSERT,
+    # así que se reintenta en la misma transacción sin SAVEPOINT.
+    async def create_club(self, newclub: NewClub, club_codes):
         try:
-            query = self.clubs_table.insert().values(
-                club_code=club_code,
-                club_name=newclub.club_name,
-                club_desc=newclub.club_desc,
-                is_private=newclub.is_private,
-                is_academic=newclub.is_academic
-            )
-            result = db.execute(query)
-            db.commit()
-            id_club = result.lastrowid
-            self.add_founder_to_club(id_club, newclub.id_user)
-            return True
+            for club_code in club_codes:
+                query = self.clubs_table.insert().values(
+                    club_code=club_code,
+                    club_name=newclub.club_name,
+                    club_desc=newclub.club_desc,
+                    is_private=newclub.is_private,
+                    is_academic=newclub.is_academic
+                )
+                try:
+                    result = await self.db.execute(query)
+                    break
+                except IntegrityError as e:
+                    if not is_duplicate_key(e, "uq_clubs_club_code"):
+                        raise
+            else:
+                raise HTTPException(status_code=503, detail="Could not allocate a unique club code, try again")
+            return result.lastrowid
+        except HTTPException:
+            raise
         except Exception as e:
-            db.rollback()
             raise HTTPException(status_code=500, detail=f"DB Error while creating new club: {e}")
-        finally:
-            db.close()
 
-    def update_club(self,updateclub: UpdateClub, club_id: int):
-        db = self._get_db()
+    async def update_club(self,updateclub: UpdateClub, club_id: int):
         try:
             query = self.clubs_table.update().where(self.clubs_table.c.id_club == club_id).values(
                 club_name=updateclub.club_name,
@@ -56,33 +60,23 @@ class ClubRepository:
                 is_private=updateclub.is_private,
                 is_academic=updateclub.is_academic
             )
-            db.execute(query)
-            db.commit()
+            await self.db.execute(query)
             return True
         except Exception:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while updating club")
-        finally:
-            db.close()
 
-    def delete_club(self, club_id: int):
-        db = self._get_db()
+    async def delete_club(self, club_id: int):
         try:
             query = self.clubs_table.update().where(self.clubs_table.c.id_club == club_id).values(
                 club_status='I'
             )
-            db.execute(query)
-            db.commit()
+            await self.db.execute(query)
             return True
         except Exception as e:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while deleting club" + str(e))
-        finally:
-            db.close()
 
     # Método para obtener todos los clubes activos en los que no soy fundador ni miembro y tampoco he solicitado membresía
-    def get_all_clubs(self, id_user: int):
-        db = self._get_db()
+    async def get_all_clubs(self, id_user: int):
         try:
             query = self.clubs_table.select().where(
                 and_(
@@ -99,17 +93,53 @@ class ClubRepository:
                     self.clubs_table.c.club_status == 'A'
                 )
             )
-            result = db.execute(query)
+            result = await self.db.execute(query)
             clubs = result.fetchall()
             return [Club(**club._asdict()) for club in clubs]  # Convertir cada fila a un objeto Club
         except Exception as e:
             raise HTTPException(status_code=500, detail="DB Error while getting all clubs " + str(e))
-        finally:
-            db.close()
+
+    # Descubrir clubes activos donde el usuario no participa ni solicitó membresía, paginado por keyset:
+    # se ordena por id_club descendente y el cursor es el último id_club de la página anterior
+    async def discover_clubs(self, id_user: int, search: Optional[str], is_private: Optional[bool],
+                             is_academic: Optional[bool], cursor: Optional[int], limit: int):
+        try:
+            conditions = [
+                self.clubs_table.c.club_status == 'A',
+                # NOT EXISTS correlacionado: MySQL lo resuelve como anti-join sobre (id_user, id_club)
+                ~exists().where(and_(self.participants_table.c.id_club == self.clubs_table.c.id_club,
+                                     self.participants_table.c.id_user == id_user)),
+                ~exists().where(and_(self.club_requests_table.c.id_club == self.clubs_table.c.id_club,
+                                     self.club_requests_table.c.id_user == id_user)),
+            ]
+            if cursor is not None:
+                conditions.append(self.clubs_table.c.id_club < cursor)
+            if search:
+                conditions.append(or_(self.clubs_table.c.club_name.contains(search, autoescape=True),
+                                      self.clubs_table.c.club_desc.contains(search, autoescape=True)))
+            if is_private is not None:
+                conditions.append(self.clubs_table.c.is_private == is_private)
+            if is_academic is not None:
+                conditions.append(self.clubs_table.c.is_academic == is_academic)
+
+            # Se pide una fila de más para saber si hay otra página
+            query = select(
+                self.clubs_table.c.id_club,
+                self.clubs_table.c.club_code,
+                self.clubs_table.c.club_name,
+                self.clubs_table.c.club_desc,
+                self.clubs_table.c.is_private,
+                self.clubs_table.c.is_academic
+            ).where(and_(*conditions)).order_by(self.clubs_table.c.id_club.desc()).limit(limit + 1)
+            result = await self.db.execute(query)
+            clubs = [ClubInfo(**club._asdict()) for club in result.fetchall()]
+            next_cursor = clubs[limit - 1].id_club if len(clubs) > limit else None
+            return ClubPage(items=clubs[:limit], next_cursor=next_cursor)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while discovering clubs " + str(e))
 
     # Método para obtener todos los clubes creados por un usuario (role=Founder)
-    def get_founded_clubs(self, id_user: int):
-        db = self._get_db()
+    async def get_founded_clubs(self, id_user: int):
         try:
             query = self.participants_table.join(
                 self.clubs_table,
@@ -121,17 +151,14 @@ class ClubRepository:
                     self.clubs_table.c.club_status == 'A'
                 )
             )
-            result = db.execute(query)
+            result = await self.db.execute(query)
             club_ids = [row.id_club for row in result.fetchall()]
-            return self.get_clubs_by_ids(db, club_ids)
+            return await self.get_clubs_by_ids(club_ids)
         except Exception:
             raise HTTPException(status_code=500, detail="DB Error while getting clubs by founder")
-        finally:
-            db.close()
 
     # Método para obtener todos los clubes en los que participa un usuario (role=Member)
-    def get_joined_clubs(self, id_user: int):
-        db = self._get_db()
+    async def get_joined_clubs(self, id_user: int):
         try:
             query = self.participants_table.join(
                 self.clubs_table,
@@ -143,130 +170,160 @@ class ClubRepository:
                     self.clubs_table.c.club_status == 'A'
                 )
             )
-            result = db.execute(query)
+            result = await self.db.execute(query)
             clubs = result.fetchall()
             club_ids = [row.id_club for row in clubs]
-            return self.get_clubs_by_ids(db, club_ids)
+            return await self.get_clubs_by_ids(club_ids)
         except Exception:
             raise HTTPException(status_code=500, detail="DB Error while getting clubs by member")
-        finally:
-            db.close()
+
+    # Clubes del usuario para la pantalla de inicio en una sola consulta: los que fundó o en los que
+    # participa (con su id_role) y a los que solicitó membresía sin ser aprobado (con su id_request_status)
+    async def get_my_clubs(self, id_user: int):
+        try:
+            query = statements.get("club.mine", self._build_my_clubs_query)
+            result = await self.db.execute(query, {"id_user": id_user})
+            my_clubs = MyClubs(founded=[], joined=[], pending=[], rejected=[])
+            for row in result.fetchall():
+                club = MyClub(**row._asdict())
+                if club.id_role == 1:
+                    my_clubs.founded.append(club)
+                elif club.id_role == 2:
+                    my_clubs.joined.append(club)
+                elif club.id_request_status == 2:
+                    my_clubs.pending.append(club)
+                elif club.id_request_status == 3:
+                    my_clubs.rejected.append(club)
+            return my_clubs
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while getting user clubs " + str(e))
+
+    def _build_my_clubs_query(self):
+        club_columns = (
+            self.clubs_table.c.id_club,
+            self.clubs_table.c.club_code,
+            self.clubs_table.c.club_name,
+            self.clubs_table.c.club_desc,
+            self.clubs_table.c.is_private,
+            self.clubs_table.c.is_academic,
+        )
+        memberships = select(
+            *club_columns,
+            self.participants_table.c.id_role.label("id_role"),
+            null().label("id_request_status"),
+            null().label("request_date")
+        ).select_from(self.participants_table.join(
+            self.clubs_table,
+            self.participants_table.c.id_club == self.clubs_table.c.id_club
+        )).where(and_(
+            self.participants_table.c.id_user == bindparam("id_user"),
+            self.participants_table.c.id_role.in_([1, 2]),
+            self.participants_table.c.participant_status == 'A',
+            self.clubs_table.c.club_status == 'A'
+        ))
+        requests = select(
+            *club_columns,
+            null().label("id_role"),
+            self.club_requests_table.c.id_request_status.label("id_request_status"),
+            cast(self.club_requests_table.c.request_date, String(50)).label("request_date")
+        ).select_from(self.club_requests_table.join(
+            self.clubs_table,
+            self.club_requests_table.c.id_club == self.clubs_table.c.id_club
+        )).where(and_(
+            self.club_requests_table.c.id_user == bindparam("id_user"),
+            self.club_requests_table.c.id_request_status != 1,
+            self.clubs_table.c.club_status == 'A'
+        ))
+        return union_all(memberships, requests)
 
     # Método para obtener clubes por una lista de IDs
-    def get_clubs_by_ids(self, db, club_ids):
+    async def get_clubs_by_ids(self, club_ids):
         if club_ids:
             query_clubs = self.clubs_table.select().where(
                 self.clubs_table.c.id_club.in_(club_ids)
             )
-            result_clubs = db.execute(query_clubs)
+            result_clubs = await self.db.execute(query_clubs)
             clubs = result_clubs.fetchall()
             return [Club(**club._asdict()) for club in clubs]  # Convertir cada fila a un objeto Club
         else:
             return []
 
     # Método para agregar al fundador como miembro del club creado
-    def add_founder_to_club(self, id_club: int, id_user: int):
-        db = self._get_db()
+    async def add_founder_to_club(self, id_club: int, id_user: int):
         try:
             query = self.participants_table.insert().values(
                 id_user=id_user,
                 id_role=1,
                 id_club=id_club
             )
-            db.execute(query)
-            db.commit()
+            await self.db.execute(query)
             return True
         except Exception:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while adding founder to club")
-        finally:
-            db.close()
-
-    def get_club(self, club_id: str):
-        db = self._get_db()
-        try:
-            query = self.clubs_table.select().where(
-                and_(
-                    or_(self.clubs_table.c.id_club == club_id,
-                        self.clubs_table.c.club_code== club_id
-                        ),
-                        self.clubs_table.c.club_status == 'A'))
-            result = db.execute(query)
-            club = result.fetchone()
-            if club is None:
-                raise HTTPException(status_code=404, detail="Club not found")
-            else:
-                return Club(id_club=club.id_club,
-                        club_code=club.club_code,
-                        club_name=club.club_name,
-                        club_desc=club.club_desc,
-                        is_private=club.is_private,
-                        is_academic=club.is_academic)
-        finally:
-            db.close()
-
-    def is_unique_club_code(self, club_code: str):
-        db = self._get_db()
-        try:
-            query = self.clubs_table.select().where(self.clubs_table.c.club_code == club_code)
-            result = db.execute(query)
-            club = result.fetchone()
-            return club is None
-        except Exception:
-            raise HTTPException(status_code=500, detail="DB Error while checking club code")
-        finally:
-            db.close()
 
-    def add_member(self, club_id: int, user_id: int):
-        db = self._get_db()
+    # Búsquedas separadas por id_club y por club_code para que cada una use su índice
+    async def get_club_by_id(self, club_id: int):
+        query = statements.get("club.by_id", lambda: self.clubs_table.select().where(
+            and_(self.clubs_table.c.id_club == bindparam("club_id"),
+                 self.clubs_table.c.club_status == 'A')))
+        result = await self.db.execute(query, {"club_id": club_id})
+        return self._to_club(result.fetchone())
+
+    async def get_club_by_code(self, club_code: str):
+        query = statements.get("club.by_code", lambda: self.clubs_table.select().where(
+            and_(self.clubs_table.c.club_code == bindparam("club_code"),
+                 self.clubs_table.c.club_status == 'A')))
+        result = await self.db.execute(query, {"club_code": club_code})
+        return self._to_club(result.fetchone())
+
+    @staticmethod
+    def _to_club(club):
+        if club is None:
+            raise HTTPException(status_code=404, detail="Club not found")
+        else:
+            return Club(id_club=club.id_club,
+                    club_code=club.club_code,
+                    club_name=club.club_name,
+                    club_desc=club.club_desc,
+                    is_private=club.is_private,
+                    is_academic=club.is_academic)
+
+    async def add_member(self, club_id: int, user_id: int):
         try:
             query = self.participants_table.insert().values(
                 id_user=user_id,
                 id_role=2,
                 id_club=club_id
             )
-            db.execute(query)
-            db.commit()
+            await self.db.execute(query)
             #retornar el objeto creado
             return True
         except Exception:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while adding member to club")
-        finally:
-            db.close()
 
-    def request_membership(self, club_id: int, user_id: int):
-        db = self._get_db()
+    async def request_membership(self, club_id: int, user_id: int):
         try:
             query = self.club_requests_table.insert().values(
                 id_club=club_id,
                 id_user=user_id,
                 id_request_status=2
             )
-            db.execute(query)
-            db.commit()
+            await self.db.execute(query)
             return True
         except Exception:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while requesting membership")
-        finally:
-            db.close()
 
-    def get_requests(self, user_id: int):
-        db = self._get_db()
+    async def get_requests(self, user_id: int):
         try:
             query = self.club_requests_table.select().where(and_(self.club_requests_table.c.id_user == user_id,
                                                                  self.club_requests_table.c.id_request_status != 1))
-            result = db.execute(query)
+            result = await self.db.execute(query)
             requests = result.fetchall()
             return [ClubRequest(**request._asdict()) for request in requests]
         except Exception:
             raise HTTPException(status_code=500, detail="DB Error while getting requests")
-        finally:
-            db.close()
 
-    def get_club_requests_with_user_names(self, club_id: int):
-        db = self._get_db()
+    async def get_club_requests_with_user_names(self, club_id: int):
         try:
             # Realizamos un JOIN entre club_requests_table y users_table para obtener solo los campos necesarios
             query = self.club_requests_table.join(
@@ -279,7 +336,7 @@ class ClubRepository:
                 )
             )
 
-            result = db.execute(query)
+            result = await self.db.execute(query)
             requests = result.fetchall()
 
             # Filtramos los datos para solo incluir los campos requeridos en la respuesta
@@ -294,11 +351,8 @@ class ClubRepository:
             ]
         except Exception:
             raise HTTPException(status_code=500, detail="DB Error while getting club requests with user names")
-        finally:
-            db.close()
 
-    def approve_membership(self, club_id: int, user_id: int):
-        db = self._get_db()
+    async def approve_membership(self, club_id: int, user_id: int):
         try:
             query = self.club_requests_table.update().where(
                 and_(
@@ -309,20 +363,16 @@ class ClubRepository:
             ).values(
                 id_request_status=1
             )
-            result = db.execute(query)
+            result = await self.db.execute(query)
             if result.rowcount == 0:  # rowcount indica el número de filas afectadas
                 raise HTTPException(status_code=404, detail="Request is not pending")
-            db.commit()
-            self.add_member(club_id, user_id)
             return True
+        except HTTPException:
+            raise
         except Exception:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while approving membership")
-        finally:
-            db.close()
 
-    def reject_membership(self, club_id: int, user_id: int):
-        db = self._get_db()
+    async def reject_membership(self, club_id: int, user_id: int):
         try:
             query = self.club_requests_table.update().where(
                 and_(
@@ -333,20 +383,104 @@ class ClubRepository:
             ).values(
                 id_request_status=3
             )
-            result = db.execute(query)
+            result = await self.db.execute(query)
             if result.rowcount == 0:  # rowcount indica el número de filas afectadas
                 raise HTTPException(status_code=404, detail="Request is not pending")
-            db.commit()
             return True
+        except HTTPException:
+            raise
         except Exception:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while rejecting membership")
-        finally:
-            db.close()
+
+    # ---- Operaciones masivas de membresía ----
+    # Cada una lee el estado actual con FOR UPDATE (en el primario y bloqueando las filas),
+    # aplica un UPDATE ... IN o un INSERT executemany y devuelve {id_user: estado}.
+
+    async def _pending_requests(self, club_id: int, user_ids: List[int]):
+        query = select(self.club_requests_table.c.id_user).where(
+            and_(
+                self.club_requests_table.c.id_club == club_id,
+                self.club_requests_table.c.id_user.in_(user_ids),
+                self.club_requests_table.c.id_request_status == 2
+            )
+        ).with_for_update()
+        result = await self.db.execute(query)
+        return set(result.scalars().all())
+
+    async def _participants(self, club_id: int, user_ids: List[int]):
+        query = select(self.participants_table.c.id_user, self.participants_table.c.participant_status).where(
+            and_(
+                self.participants_table.c.id_club == club_id,
+                self.participants_table.c.id_user.in_(user_ids)
+            )
+        ).with_for_update()
+        result = await self.db.execute(query)
+        return {row.id_user: row.participant_status for row in result.fetchall()}
+
+    async def _set_request_status(self, club_id: int, user_ids, id_request_status: int):
+        await self.db.execute(self.club_requests_table.update().where(
+            and_(
+                self.club_requests_table.c.id_club == club_id,
+                self.club_requests_table.c.id_user.in_(user_ids),
+                self.club_requests_table.c.id_request_status == 2
+            )
+        ).values(id_request_status=id_request_status))
+
+    async def add_members(self, club_id: int, user_ids: List[int]):
+        try:
+            participants = await self._participants(club_id, user_ids)
+            new_members = [user_id for user_id in user_ids if user_id not in participants]
+            inactive = [user_id for user_id in user_ids if participants.get(user_id) == 'I']
+            if new_members:
+                await self.db.execute(self.participants_table.insert(),
+                                      [{"id_user": user_id, "id_role": 2, "id_club": club_id} for user_id in new_members])
+            if inactive:
+                # Ex miembros que vuelven: se reactiva su fila en lugar de insertar otra
+                await self.db.execute(self.participants_table.update().where(
+                    and_(
+                        self.participants_table.c.id_club == club_id,
+                        self.participants_table.c.id_user.in_(inactive)
+                    )
+                ).values(participant_status='A'))
+            return {user_id: "already_member" if participants.get(user_id) == 'A' else "added" for user_id in user_ids}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail="DB Error while adding members to club " + str(e))
+
+    async def approve_memberships(self, club_id: int, user_ids: List[int]):
+        try:
+            pending = await self._pending_requests(club_id, user_ids)
+            if pending:
+                await self._set_request_status(club_id, pending, 1)
+            return {user_id: "approved" if user_id in pending else "not_pending" for user_id in user_ids}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail="DB Error while approving memberships " + str(e))
+
+    async def reject_memberships(self, club_id: int, user_ids: List[int]):
+        try:
+            pending = await self._pending_requests(club_id, user_ids)
+            if pending:
+                await self._set_request_status(club_id, pending, 3)
+            return {user_id: "rejected" if user_id in pending else "not_pending" for user_id in user_ids}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail="DB Error while rejecting memberships " + str(e))
+
+    async def remove_members(self, club_id: int, user_ids: List[int]):
+        try:
+            participants = await self._participants(club_id, user_ids)
+            active = [user_id for user_id in user_ids if participants.get(user_id) == 'A']
+            if active:
+                await self.db.execute(self.participants_table.update().where(
+                    and_(
+                        self.participants_table.c.id_club == club_id,
+                        self.participants_table.c.id_user.in_(active)
+                    )
+                ).values(participant_status='I'))
+            return {user_id: "removed" if user_id in active else "not_member" for user_id in user_ids}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail="DB Error while removing members " + str(e))
 
     # Método para obtener el ranking de un club ordenado de mayor a menor segun la columna total_score
-    def get_club_ranking(self, club_id: int):
-        db = self._get_db()
+    async def get_club_ranking(self, club_id: int):
         try:
             #join con users para obtener el nombre del usuario
             query = self.participants_table.join(
@@ -358,80 +492,95 @@ class ClubRepository:
                     self.participants_table.c.participant_status == 'A'
                 )
             ).order_by(self.participants_table.c.total_score.desc())
-            result = db.execute(query)
+            result = await self.db.execute(query)
             participants = result.fetchall()
             return [ClubRanking(**participant._asdict()) for participant in participants]
         except Exception as e:
             raise HTTPException(status_code=500, detail="DB Error while getting club ranking" + str(e))
-        finally:
-            db.close()
 
-    def get_member_medals_by_club(self, club_id: int, user_id: int):
-        db = self._get_db()
+    # Puntajes globales de todos los usuarios, de mayor a menor, para el ranking global en memoria
+    async def get_global_scores(self):
         try:
-            query = self.medals_awarded.join(
-                self.medal_qualities,
-                self.medals_awarded.c.id_medal_quality == self.medal_qualities.c.id_medal_quality
-            ).join(
-                self.medal_types,
-                self.medal_qualities.c.id_medal_type == self.medal_types.c.id_medal_type
-            ).select().with_only_columns(
-                self.medal_qualities.c.medal_q_name,
-                self.medal_types.c.medal_type_name
-            ).where(
+            query = select(
+                self.users_table.c.id_user,
+                self.users_table.c.user_name,
+                self.users_table.c.global_score
+            ).order_by(self.users_table.c.global_score.desc(), self.users_table.c.id_user)
+            result = await self.db.execute(query)
+            return result.fetchall()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while getting global scores" + str(e))
+
+    # Las medallas se leen solo como id_medal_quality; los nombres de tipo y calidad
+    # los resuelve el caché de datos de referencia sin hacer join
+    async def get_member_medals_by_club(self, club_id: int, user_id: int):
+        try:
+            query = select(self.medals_awarded.c.id_medal_quality).where(
                 and_(
                     self.medals_awarded.c.id_club == club_id,
                     self.medals_awarded.c.id_user == user_id
                 )
             )
-            result = db.execute(query)
-            medals = result.fetchall()
-            print(medals)
-            return [MedalsByClub(**medal._asdict()) for medal in medals]
+            result = await self.db.execute(query)
+            return result.scalars().all()
         except Exception as e:
             raise HTTPException(status_code=500, detail="DB Error while getting member medals by club" + str(e))
-        finally:
-            db.close()
 
-    def get_user_medals(self, id_user: int):
-        db = self._get_db()
+    async def get_user_medals(self, id_user: int):
+        return (await self.get_users_medals([id_user]))[id_user]
+
+    # Medallas de varios usuarios en una sola consulta: {id_user: [(id_medal_quality, quantity)]}
+    async def get_users_medals(self, user_ids: List[int]):
+        medals_by_user = {id_user: [] for id_user in user_ids}
+        if not user_ids:
+            return medals_by_user
         try:
-            query = self.medals_awarded.join(
-                self.medal_qualities,
-                self.medals_awarded.c.id_medal_quality == self.medal_qualities.c.id_medal_quality
-            ).join(
-                self.medal_types,
-                self.medal_qualities.c.id_medal_type == self.medal_types.c.id_medal_type
-            ).select().with_only_columns(
-                self.medal_qualities.c.medal_q_name,
-                self.medal_types.c.medal_type_name,
-                count(self.medals_awarded.c.id_medal_quality).label('quantity')
+            query = select(
+                self.medals_awarded.c.id_user,
+                self.medals_awarded.c.id_medal_quality,
+                count().label('quantity')
             ).where(
-                self.medals_awarded.c.id_user == id_user
+                self.medals_awarded.c.id_user.in_(user_ids)
             ).group_by(
+                self.medals_awarded.c.id_user,
                 self.medals_awarded.c.id_medal_quality
             )
-            result = db.execute(query)
-            medals = result.fetchall()
-            return [MedalsByUser(**medal._asdict()) for medal in medals]
+            result = await self.db.execute(query)
+            for medal in result.fetchall():
+                medals_by_user[medal.id_user].append((medal.id_medal_quality, medal.quantity))
+            return medals_by_user
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while getting users medals" + str(e))
+
+    # Catálogo de medallas (calidad + tipo) para el caché de datos de referencia
+    async def get_medal_catalog(self):
+        try:
+            query = select(
+                self.medal_qualities.c.id_medal_quality,
+                self.medal_qualities.c.medal_q_name,
+                self.medal_types.c.id_medal_type,
+                self.medal_types.c.medal_type_name
+            ).select_from(self.medal_qualities.join(
+                self.medal_types,
+                self.medal_qualities.c.id_medal_type == self.medal_types.c.id_medal_type
+            )).order_by(self.medal_qualities.c.id_medal_quality)
+            result = await self.db.execute(query)
+            return [MedalCatalogEntry(**medal._asdict()) for medal in result.fetchall()]
         except Exception as e:
-            raise HTTPException(status_code=500, detail="DB Error while getting user medals" + str(e))
-        finally:
-            db.close()
+            raise HTTPException(status_code=500, detail="DB Error while getting medal catalog" + str(e))
 
     #traer la info del usuario haciendo join con careers para obtener el career_name
-    def get_user_profile(self, user_id: int):
+    async def get_user_profile(self, user_id: int):
         print(user_id)
-        db = self._get_db()
         try:
             # Usar un LEFT JOIN para manejar usuarios sin carrera
-            query = self.users_table.join(
+            query = statements.get("user.profile", lambda: self.users_table.join(
                 self.careers,
                 self.users_table.c.id_career == self.careers.c.id_career,
                 isouter=True  # Esto realiza un LEFT JOIN
-            ).select().where(self.users_table.c.id_user == user_id)
+            ).select().where(self.users_table.c.id_user == bindparam("user_id")))
 
-            result = db.execute(query)
+            result = await self.db.execute(query, {"user_id": user_id})
             user = result.fetchone()
 
             if user is None:
@@ -444,11 +593,57 @@ class ClubRepository:
             return ProfileInfo(**user_data)
         except Exception as e:
             raise HTTPException(status_code=400, detail="DB Error while getting user profile: " + str(e))
-        finally:
-            db.close()
 
-    def update_user_profile(self, info: ProfileInfoUp):
-        db = self._get_db()
+    # Perfil completo en una sola consulta: datos del usuario, carrera, si tiene el perfil
+    # completo y cuántos clubes fundó, en cuántos participa y cuántas solicitudes tiene pendientes
+    async def get_user_full_profile(self, user_id: int):
+        try:
+            query = statements.get("user.full_profile", self._build_full_profile_query)
+            result = await self.db.execute(query, {"user_id": user_id})
+            user = result.fetchone()
+            if user is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            user_data = user._asdict()
+            user_data["complete"] = all(user_data[column] is not None for column in
+                                        ("real_name", "phone_number", "semester", "id_career", "sex"))
+            return UserProfile(**user_data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail="DB Error while getting user profile: " + str(e))
+
+    def _build_full_profile_query(self):
+        def memberships(id_role):
+            return select(count()).where(and_(
+                self.participants_table.c.id_user == self.users_table.c.id_user,
+                self.participants_table.c.id_role == id_role,
+                self.participants_table.c.participant_status == 'A'
+            )).scalar_subquery()
+
+        pending_requests = select(count()).where(and_(
+            self.club_requests_table.c.id_user == self.users_table.c.id_user,
+            self.club_requests_table.c.id_request_status == 2
+        )).scalar_subquery()
+        return select(
+            self.users_table.c.id_user,
+            self.users_table.c.user_name,
+            self.users_table.c.real_name,
+            self.users_table.c.phone_number,
+            self.users_table.c.semester,
+            self.users_table.c.id_career,
+            self.careers.c.career_name,
+            self.users_table.c.sex,
+            self.users_table.c.global_score,
+            memberships(1).label("clubs_founded"),
+            memberships(2).label("clubs_joined"),
+            pending_requests.label("pending_requests")
+        ).select_from(self.users_table.join(
+            self.careers,
+            self.users_table.c.id_career == self.careers.c.id_career,
+            isouter=True
+        )).where(self.users_table.c.id_user == bindparam("user_id"))
+
+    async def update_user_profile(self, info: ProfileInfoUp):
         try:
             query = self.users_table.update().where(self.users_table.c.id_user == info.id_user).values(
                 real_name=info.real_name,
@@ -457,23 +652,19 @@ class ClubRepository:
                 id_career=info.id_career,
                 sex= info.sex
             )
-            result = db.execute(query)
+            result = await self.db.execute(query)
             if result.rowcount == 0:  # rowcount indica el número de filas afectadas
                 raise HTTPException(status_code=404, detail="User not found")
-            db.commit()
 
             return "User profile updated"
         except Exception as e:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while updating user profile" + str(e))
-        finally:
-            db.close()
     # verificar si el usuario ya tiene completos los campos de real_name, phone_number, semester, career
-    def check_user_info(self, user_id: int):
-        db = self._get_db()
+    async def check_user_info(self, user_id: int):
         try:
-            query = self.users_table.select().where(self.users_table.c.id_user == user_id)
-            result = db.execute(query)
+            query = statements.get("user.by_id", lambda: self.users_table.select().where(
+                self.users_table.c.id_user == bindparam("user_id")))
+            result = await self.db.execute(query, {"user_id": user_id})
             user = result.fetchone()
             if user is None:
                 raise HTTPException(status_code=404, detail="User not found")
@@ -482,23 +673,17 @@ class ClubRepository:
             return JSONResponse(status_code=200, content={"complete": True})
         except Exception as e:
             raise HTTPException(status_code=400, detail="DB Error while checking user info" + str(e))
-        finally:
-            db.close()
 
-    def get_all_careers(self):
-        db = self._get_db()
+    async def get_all_careers(self):
         try:
             query = self.careers.select()
-            result = db.execute(query)
+            result = await self.db.execute(query)
             careers = result.fetchall()
             return [Career(**career._asdict()) for career in careers]
         except Exception as e:
             raise HTTPException(status_code=400, detail="DB Error while getting all careers" + str(e))
-        finally:
-            db.close()
 
-    def remove_member(self, club_id: int, user_id: int):
-        db = self._get_db()
+    async def remove_member(self, club_id: int, user_id: int):
         try:
             query = self.participants_table.update().where(
                 and_(
@@ -508,11 +693,7 @@ class ClubRepository:
             ).values(
                     participant_status='I'
                 )
-            db.execute(query)
-            db.commit()
+            await self.db.execute(query)
             return True
         except Exception as e:
-            db.rollback()
             raise HTTPException(status_code=400, detail="DB Error while removing member" + str(e))
-        finally:
-            db.close()
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_table
+from core.statement_cache import statements
+
+
+# MySQL guarda DATETIME sin zona horaria: se escribe y se lee en UTC
+def _to_db(value: datetime):
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value is not None else None
+
+def _from_db(value: datetime):
+    return value.replace(tzinfo=timezone.utc) if value is not None else None
+
+
+class QuizJobRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.quiz_jobs = get_table('quiz_jobs')
+
+    async def create(self, job):
+        try:
+            await self.db.execute(self.quiz_jobs.insert().values(
+                job_id=job.job_id,
+                resource_id=job.resource_id,
+                id_club=job.id_club,
+                regenerate=job.regenerate,
+                status=job.status,
+                created_at=_to_db(job.created_at)
+            ))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"DB Error while creating quiz job: {e}")
+
+    async def update(self, job):
+        try:
+            await self.db.execute(self.quiz_jobs.update().where(self.quiz_jobs.c.job_id == job.job_id).values(
+                status=job.status,
+                error=job.error[:500] if job.error else None,
+                result=json.dumps(job.result, ensure_ascii=False) if job.result is not None else None,
+                started_at=_to_db(job.started_at),
+                finished_at=_to_db(job.finished_at)
+            ))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"DB Error while updating quiz job: {e}")
+
+    # Fila del trabajo con los datetime en UTC y result decodificado, o None si no existe
+    async def get(self, job_id: str):
+        try:
+            query = statements.get("quiz_job.by_id", lambda: self.quiz_jobs.select().where(
+                self.quiz_jobs.c.job_id == bindparam("job_id")))
+            result = await self.db.execute(query, {"job_id": job_id})
+            row = result.fetchone()
+            if row is None:
+                return None
+            job = row._asdict()
+            for column in ("created_at", "started_at", "finished_at"):
+                job[column] = _from_db(job[column])
+            job["regenerate"] = bool(job["regenerate"])
+            job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+            return job
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"DB Error while getting quiz job: {e}")
+
+    async def delete_finished_before(self, cutoff: datetime):
+        try:
+            await self.db.execute(self.quiz_jobs.delete().where(self.quiz_jobs.c.finished_at < _to_db(cutoff)))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"DB Error while deleting old quiz jobs: {e}")
+
+    # Marca como fallidos los trabajos sin terminar: los de job_ids o los creados antes de created_before.
+    # Devuelve cuántos cambió
+    async def fail_unfinished(self, error: str, finished_at: datetime, job_ids=None, created_before: datetime = None):
+        try:
+            query = self.quiz_jobs.update().where(self.quiz_jobs.c.finished_at.is_(None))
+            if job_ids is not None:
+                query = query.where(self.quiz_jobs.c.job_id.in_(job_ids))
+            if created_before is not None:
+                query = query.where(self.quiz_jobs.c.created_at < _to_db(created_before))
+            result = await self.db.execute(query.values(status="failed", error=error, finished_at=_to_db(finished_at)))
+            return result.rowcount
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"DB Error while failing unfinished quiz jobs: {e}")
@@ -1,43 +1,51 @@
 import json
 from itertools import count
 from typing import List
-from fastapi import Depends, HTTPException
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
-from core.database import get_db, get_table
+from core.database import get_table, is_duplicate_key
+from core.statement_cache import statements
 from models.responses import QuizDB, QuizMember, QuizCompare, QuizResponse
 
 
+# Columnas que escribe submit_quiz
+SUBMIT_COLUMNS = ("id_user", "id_role", "id_club", "id_quiz", "quantity_correct_answers", "time_spent", "score", "answers",
+                  "score_pending")
+# submit_quiz no insertó porque el quiz ya no tiene la versión con la que se calificó
+QUIZ_VERSION_CHANGED = object()
+
+
 class QuizRepository:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.quizzes = get_table('quizzez')
         self.reading_resources = get_table('reading_resources')
         self.quiz_results = get_table('quiz_results')
 
-    def _get_db(self) -> Session:
-        db = next(get_db())
-        return db
-
-    def get_quiz(self, resource_id: int):
-        db = self._get_db()
+    async def get_quiz(self, resource_id: int, for_update: bool = False):
         print(f"Resource ID: {resource_id}")
         try:
-            query = self.quizzes.select().where(self.quizzes.c.id_reading_resource == resource_id)
-            result = db.execute(query)
+            if for_update:
+                query = statements.get("quiz.by_resource_for_update", lambda: self.quizzes.select().where(
+                    self.quizzes.c.id_reading_resource == bindparam("resource_id")).with_for_update())
+            else:
+                query = statements.get("quiz.by_resource", lambda: self.quizzes.select().where(
+                    self.quizzes.c.id_reading_resource == bindparam("resource_id")))
+            result = await self.db.execute(query, {"resource_id": resource_id})
             quiz = result.fetchone()
             if quiz is None:
                 raise HTTPException(status_code=404, detail="Quiz not found")
             return QuizDB(**quiz._asdict())
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"DB Error while getting quiz: {e}")
-        finally:
-            db.close()
 
-    def save_quiz(self, resource_id: int, quiz: dict):
-        db = self._get_db()
+    # Inserta el quiz del recurso. Devuelve False si ya había uno: el índice único
+    # uq_quizzez_id_reading_resource (migrations/007_unique_quiz_resource.sql) rechaza el segundo
+    async def save_quiz(self, resource_id: int, quiz: dict):
         print(f"quiz: {quiz}")
         try:
             # Convertir listas a cadenas JSON sin codificación Unicode
@@ -53,18 +61,18 @@ class QuizRepository:
                 minutes_to_answer=quiz.get('quantity_questions'),
                 id_reading_resource=resource_id
             )
-            db.execute(query)
-            db.commit()
+            try:
+                await self.db.execute(query)
+            except IntegrityError as e:
+                if not is_duplicate_key(e, "uq_quizzez_id_reading_resource"):
+                    raise
+                return False
             return True
         except Exception as e:
-            db.rollback()
             raise HTTPException(status_code=500, detail=f"DB Error while adding quiz: {e}")
-        finally:
-            db.close()
 
-    def regen_quiz(self, resource_id, quiz: dict):
-        id_quiz = self.get_quiz(resource_id).id_quiz
-        db = self._get_db()
+    async def regen_quiz(self, resource_id, quiz: dict):
+        id_quiz = (await self.get_quiz(resource_id)).id_quiz
         try:
             # Convertir listas a cadenas JSON sin codificación Unicode
             questions_json = json.dumps(quiz.get('questions'), ensure_ascii=False)
@@ -77,36 +85,31 @@ class QuizRepository:
                 answers=answers_json,
                 correct_answers=correct_answers_json,
                 quantity_questions=quiz.get('quantity_questions'),
-                minutes_to_answer=quiz.get('quantity_questions')
+                minutes_to_answer=quiz.get('quantity_questions'),
+                version=self.quizzes.c.version + 1
             )
-            db.execute(query)
-            db.commit()
-            return True
+            await self.db.execute(query)
+            return id_quiz
         except Exception as e:
-            db.rollback()
             raise HTTPException(status_code=500, detail=f"DB Error while adding quiz: {e}")
-        finally:
-            db.close()
 
-    def quiz_exists(self, resource_id: int):
+    async def quiz_exists(self, resource_id: int):
         print(resource_id)
-        db = self._get_db()
         try:
-            query = self.quizzes.select().where(self.quizzes.c.id_reading_resource == resource_id)
-            result = db.execute(query)
+            query = statements.get("quiz.exists", lambda: select(self.quizzes.c.id_quiz).where(
+                self.quizzes.c.id_reading_resource == bindparam("resource_id")).limit(1))
+            result = await self.db.execute(query, {"resource_id": resource_id})
             quiz = result.fetchone()
             return quiz is not None
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"DB Error while checking quiz existence: {e}")
-        finally:
-            db.close()
 
     #trae el quiz de la base de datos asociado al resource_id sin las respuestas correctas
-    def get_quiz_from_db_for_members(self, resource_id: int):
-        db = self._get_db()
+    async def get_quiz_from_db_for_members(self, resource_id: int):
         try:
-            query = self.quizzes.select().where(self.quizzes.c.id_reading_resource == resource_id)
-            result = db.execute(query)
+            query = statements.get("quiz.by_resource", lambda: self.quizzes.select().where(
+                self.quizzes.c.id_reading_resource == bindparam("resource_id")))
+            result = await self.db.execute(query, {"resource_id": resource_id})
             quiz = result.fetchone()
             if quiz is None:
                 raise HTTPException(status_code=404, detail="Quiz not found")
@@ -115,81 +118,155 @@ class QuizRepository:
                               answers=quiz.answers,
                               quantity_questions=quiz.quantity_questions,
                               minutes_to_answer=quiz.minutes_to_answer,
-                              id_reading_resource=quiz.id_reading_resource)
+                              id_reading_resource=quiz.id_reading_resource,
+                              version=quiz.version)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"DB Error while getting quiz: {e}")
-        finally:
-            db.close()
 
-    def get_items_quiz(self, id_quiz: int):
-        db = self._get_db()
+    # Versión actual del quiz del recurso (cambia con cada regen_quiz)
+    async def get_quiz_version(self, resource_id: int) -> int:
         try:
-            query = self.quizzes.select().where(self.quizzes.c.id_quiz == id_quiz)
-            result = db.execute(query)
+            query = statements.get("quiz.version_by_resource", lambda: select(self.quizzes.c.version).where(
+                self.quizzes.c.id_reading_resource == bindparam("resource_id")))
+            result = await self.db.execute(query, {"resource_id": resource_id})
+            quiz = result.fetchone()
+            if quiz is None:
+                raise HTTPException(status_code=404, detail="Quiz not found")
+            return quiz.version
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"DB Error while getting quiz version: {e}")
+
+    # Clave de respuestas del quiz. for_share la lee en el primario con bloqueo compartido (lo último
+    # confirmado, no el snapshot de la transacción) y la fila ya no cambia hasta el commit
+    async def get_items_quiz(self, id_quiz: int, for_share: bool = False):
+        try:
+            if for_share:
+                query = statements.get("quiz.by_id_for_share", lambda: self.quizzes.select().where(
+                    self.quizzes.c.id_quiz == bindparam("id_quiz")).with_for_update(read=True))
+            else:
+                query = statements.get("quiz.by_id", lambda: self.quizzes.select().where(
+                    self.quizzes.c.id_quiz == bindparam("id_quiz")))
+            result = await self.db.execute(query, {"id_quiz": id_quiz})
             quiz = result.fetchone()
             if quiz is None:
                 raise HTTPException(status_code=404, detail="Quiz not found")
             return QuizCompare(correct_answers=json.loads(quiz.correct_answers),
                                  minutes_to_answer=quiz.minutes_to_answer,
-                                 quantity_questions=quiz.quantity_questions)
+                                 quantity_questions=quiz.quantity_questions,
+                                 version=quiz.version)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"DB Error while getting correct answers: {e}")
-        finally:
-            db.close()
-    def is_quiz_answered(self, id_user: int, id_club:int, id_quiz: int):
-        db = self._get_db()
+    async def is_quiz_answered(self, id_user: int, id_club:int, id_quiz: int):
         try:
-            query = self.quiz_results.select().where(and_(self.quiz_results.c.id_user == id_user,
-                                                          self.quiz_results.c.id_club == id_club,
-                                                          self.quiz_results.c.id_quiz == id_quiz))
-            result = db.execute(query)
+            query = statements.get("quiz_result.exists", lambda: select(self.quiz_results.c.id_quiz).where(
+                and_(self.quiz_results.c.id_user == bindparam("id_user"),
+                     self.quiz_results.c.id_club == bindparam("id_club"),
+                     self.quiz_results.c.id_quiz == bindparam("id_quiz"))).limit(1))
+            result = await self.db.execute(query, {"id_user": id_user, "id_club": id_club, "id_quiz": id_quiz})
             quiz = result.fetchone()
             return quiz is not None
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"DB Error while checking quiz existence: {e}")
-        finally:
-            db.close()
 
-    def get_quiz_results(self, id_user: int, id_club: int, id_quiz: int, correct_answers: str):
-        db = self._get_db()
+    async def get_quiz_results(self, id_user: int, id_club: int, id_quiz: int, correct_answers: str):
         try:
-            query = self.quiz_results.select().where(and_(self.quiz_results.c.id_user == id_user,
-                                                          self.quiz_results.c.id_club == id_club,
-                                                          self.quiz_results.c.id_quiz == id_quiz))
-            result = db.execute(query)
+            query = statements.get("quiz_result.by_key", lambda: self.quiz_results.select().where(
+                and_(self.quiz_results.c.id_user == bindparam("id_user"),
+                     self.quiz_results.c.id_club == bindparam("id_club"),
+                     self.quiz_results.c.id_quiz == bindparam("id_quiz"))))
+            result = await self.db.execute(query, {"id_user": id_user, "id_club": id_club, "id_quiz": id_quiz})
             quiz = result.fetchone()
             if quiz is None:
                 raise HTTPException(status_code=404, detail="Quiz result not found")
             return QuizResponse(correct_answers=correct_answers,
                                 score=self.truncate_float(quiz.score, 3),
                                 quantity_correct_answers=quiz.quantity_correct_answers)
-
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"DB Error while getting quiz results: {e}")
-        finally:
-            db.close()
-    def submit_quiz(self, score: float, correct_answers: str ,time_spent: int,answer_correctly: List[bool], id_quiz: int, id_user: int, id_club: int, id_role: int):
-        db = self._get_db()
+    # Inserta el resultado en una sola sentencia, INSERT ... SELECT sobre la fila del quiz con la
+    # versión de la clave con la que se calificó:
+    # - si regen_quiz cambió la versión no se inserta nada y se devuelve QUIZ_VERSION_CHANGED;
+    # - si ya existía un resultado para (id_user, id_club, id_quiz) el índice
+    #   uq_quiz_results_user_club_quiz lo rechaza (error 1062) y se devuelve None.
+    # El SELECT toma un bloqueo compartido sobre la fila del quiz hasta el commit, así que un
+    # regen_quiz concurrente espera al envío. MySQL solo deshace la sentencia que falla, no hace
+    # falta SAVEPOINT. No se usa INSERT IGNORE porque también convierte en warnings los errores de FK o de datos.
+    async def submit_quiz(self, score: float, correct_answers: str ,time_spent: int,answer_correctly: List[bool], id_quiz: int, id_user: int, id_club: int, id_role: int, answers: List[str], version: int):
         try:
-            query = self.quiz_results.insert().values(
-                id_user=id_user,
-                id_role=id_role,
-                id_club=id_club,
-                quantity_correct_answers=answer_correctly.count(True),
-                time_spent=time_spent,
-                score=score,
-                id_quiz=id_quiz
-            )
-            db.execute(query)
-            db.commit()
+            query = statements.get("quiz_result.insert_for_version", lambda: self.quiz_results.insert().from_select(
+                SUBMIT_COLUMNS,
+                select(*[bindparam(name, type_=self.quiz_results.c[name].type) for name in SUBMIT_COLUMNS]).where(
+                    and_(self.quizzes.c.id_quiz == bindparam("id_quiz"),
+                         self.quizzes.c.version == bindparam("version")))))
+            try:
+                result = await self.db.execute(query, {
+                    "id_user": id_user,
+                    "id_role": id_role,
+                    "id_club": id_club,
+                    "id_quiz": id_quiz,
+                    "quantity_correct_answers": answer_correctly.count(True),
+                    "time_spent": time_spent,
+                    "score": score,
+                    # Se guardan para volver a calificar el envío si el quiz se regenera
+                    "answers": json.dumps(answers, ensure_ascii=False),
+                    # Los totales los suma score_pipeline (ver migrations/008_quiz_result_applied_score.sql)
+                    "score_pending": 1,
+                    "version": version,
+                })
+            except IntegrityError as e:
+                if not is_duplicate_key(e):
+                    raise
+                return None
+            if result.rowcount == 0:
+                return QUIZ_VERSION_CHANGED
             return QuizResponse(correct_answers=correct_answers,
                                 score=self.truncate_float(score, 3),
                                 quantity_correct_answers=answer_correctly.count(True))
         except Exception as e:
-            db.rollback()
             raise HTTPException(status_code=500, detail=f"DB Error while submitting quiz: {e}")
-        finally:
-            db.close()
+
+    # Resultados del quiz que guardaron sus respuestas (los anteriores a la columna answers no se re-califican).
+    # FOR UPDATE lee lo último confirmado (no el snapshot de la transacción) e incluye los envíos que
+    # terminaron mientras regen_quiz esperaba el bloqueo de la fila del quiz
+    async def get_results_for_rescoring(self, id_quiz: int):
+        try:
+            query = statements.get("quiz_result.for_rescoring", lambda: select(
+                self.quiz_results.c.id_user,
+                self.quiz_results.c.id_club,
+                self.quiz_results.c.time_spent,
+                self.quiz_results.c.score,
+                self.quiz_results.c.quantity_correct_answers,
+                self.quiz_results.c.answers
+            ).where(and_(self.quiz_results.c.id_quiz == bindparam("id_quiz"),
+                         self.quiz_results.c.answers.is_not(None))).with_for_update())
+            result = await self.db.execute(query, {"id_quiz": id_quiz})
+            return result.fetchall()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"DB Error while getting quiz results to rescore: {e}")
+
+    # scores: [{"id_user", "id_club", "score", "quantity_correct_answers"}], un executemany por lote
+    async def update_scores(self, id_quiz: int, scores: List[dict], batch_size: int):
+        try:
+            query = self.quiz_results.update().where(
+                and_(self.quiz_results.c.id_quiz == bindparam("b_id_quiz"),
+                     self.quiz_results.c.id_user == bindparam("b_id_user"),
+                     self.quiz_results.c.id_club == bindparam("b_id_club"))
+            ).values(score=bindparam("b_score"),
+                     quantity_correct_answers=bindparam("b_quantity_correct_answers"),
+                     score_pending=1)
+            for start in range(0, len(scores), batch_size):
+                await self.db.execute(query, [{"b_id_quiz": id_quiz, **{f"b_{key}": value for key, value in row.items()}}
+                                              for row in scores[start:start + batch_size]])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"DB Error while updating quiz scores: {e}")
 
     def truncate_float(self, value: float, decimals: int) -> float:
         factor = 10 ** decimals
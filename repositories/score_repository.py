@@ -0,0 +1,151 @@
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_table
+
+
+class ScoreRepository:
+    """Estado derivado de los resultados de quizzes: totales por club, puntaje global y medallas."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.participants_table = get_table('participant_role_club')
+        self.users_table = get_table('users')
+        self.medals_awarded = get_table('medals_awarded')
+        self.quiz_results = get_table('quiz_results')
+        self.quizzes = get_table('quizzez')
+
+    # Resultados de keys [(id_user, id_club, id_quiz)] con algo por aplicar, bloqueados con FOR UPDATE
+    # y con la cantidad de preguntas actual del quiz (None si el quiz ya no existe). La subconsulta
+    # no hereda el FOR UPDATE: la fila del quiz no se bloquea y no frena los envíos ni regen_quiz
+    async def lock_pending_results(self, keys: List[tuple]):
+        try:
+            quantity_questions = select(self.quizzes.c.quantity_questions).where(
+                self.quizzes.c.id_quiz == self.quiz_results.c.id_quiz
+            ).scalar_subquery().label("quantity_questions")
+            query = select(
+                self.quiz_results.c.id_user,
+                self.quiz_results.c.id_club,
+                self.quiz_results.c.id_quiz,
+                self.quiz_results.c.score,
+                self.quiz_results.c.quantity_correct_answers,
+                self.quiz_results.c.applied_score,
+                self.quiz_results.c.applied_perfect,
+                quantity_questions
+            ).where(
+                and_(
+                    tuple_(self.quiz_results.c.id_user, self.quiz_results.c.id_club, self.quiz_results.c.id_quiz).in_(keys),
+                    self.quiz_results.c.score_pending == 1
+                )
+            ).order_by(
+                self.quiz_results.c.id_user, self.quiz_results.c.id_club, self.quiz_results.c.id_quiz
+            ).with_for_update()
+            result = await self.db.execute(query)
+            return result.fetchall()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while getting pending quiz results " + str(e))
+
+    # Hasta limit resultados con score_pending, como [(id_user, id_club, id_quiz)]
+    async def get_pending_keys(self, limit: int):
+        try:
+            query = select(
+                self.quiz_results.c.id_user,
+                self.quiz_results.c.id_club,
+                self.quiz_results.c.id_quiz
+            ).where(self.quiz_results.c.score_pending == 1).limit(limit)
+            result = await self.db.execute(query)
+            return [tuple(row) for row in result.fetchall()]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while getting pending quiz results " + str(e))
+
+    # applied: [{"id_user", "id_club", "id_quiz", "applied_score", "applied_perfect"}], un executemany
+    async def mark_applied(self, applied: List[dict]):
+        try:
+            query = self.quiz_results.update().where(
+                and_(
+                    self.quiz_results.c.id_user == bindparam("b_id_user"),
+                    self.quiz_results.c.id_club == bindparam("b_id_club"),
+                    self.quiz_results.c.id_quiz == bindparam("b_id_quiz")
+                )
+            ).values(applied_score=bindparam("b_applied_score"),
+                     applied_perfect=bindparam("b_applied_perfect"),
+                     score_pending=0)
+            await self.db.execute(query, [{f"b_{key}": value for key, value in row.items()} for row in applied])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while marking quiz results as applied " + str(e))
+
+    # deltas: [{"id_club", "id_user", "score", "solved", "questions", "perfect"}], un executemany
+    async def add_to_club_totals(self, deltas: List[dict]):
+        try:
+            query = self.participants_table.update().where(
+                and_(
+                    self.participants_table.c.id_club == bindparam("b_id_club"),
+                    self.participants_table.c.id_user == bindparam("b_id_user")
+                )
+            ).values(
+                total_score=self.participants_table.c.total_score + bindparam("b_score"),
+                quantity_quizzes_solved=self.participants_table.c.quantity_quizzes_solved + bindparam("b_solved"),
+                quantity_questions_answered=self.participants_table.c.quantity_questions_answered + bindparam("b_questions"),
+                quantity_perfect_quizzes=self.participants_table.c.quantity_perfect_quizzes + bindparam("b_perfect")
+            )
+            await self.db.execute(query, [{f"b_{key}": value for key, value in delta.items()} for delta in deltas])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while updating club totals " + str(e))
+
+    # deltas: {id_user: puntaje a sumar}, un executemany
+    async def add_to_global_scores(self, deltas: dict):
+        try:
+            query = self.users_table.update().where(
+                self.users_table.c.id_user == bindparam("b_id_user")
+            ).values(global_score=self.users_table.c.global_score + bindparam("b_score"))
+            await self.db.execute(query, [{"b_id_user": id_user, "b_score": score} for id_user, score in deltas.items()])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while updating global scores " + str(e))
+
+    # Contadores actuales de cada (id_club, id_user), ya con los deltas aplicados
+    async def get_counters(self, pairs: List[tuple]):
+        try:
+            query = select(
+                self.participants_table.c.id_club,
+                self.participants_table.c.id_user,
+                self.participants_table.c.total_score,
+                self.participants_table.c.quantity_quizzes_solved,
+                self.participants_table.c.quantity_questions_answered,
+                self.participants_table.c.quantity_perfect_quizzes
+            ).where(
+                tuple_(self.participants_table.c.id_club, self.participants_table.c.id_user).in_(pairs)
+            )
+            result = await self.db.execute(query)
+            return result.fetchall()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while getting participant counters " + str(e))
+
+    # Medallas de quality_ids que ya tienen esos (id_club, id_user): {(id_club, id_user, id_medal_quality)}
+    async def get_awarded(self, pairs: List[tuple], quality_ids: List[int]):
+        try:
+            query = select(
+                self.medals_awarded.c.id_club,
+                self.medals_awarded.c.id_user,
+                self.medals_awarded.c.id_medal_quality
+            ).where(
+                and_(
+                    tuple_(self.medals_awarded.c.id_club, self.medals_awarded.c.id_user).in_(pairs),
+                    self.medals_awarded.c.id_medal_quality.in_(quality_ids)
+                )
+            )
+            result = await self.db.execute(query)
+            return {tuple(row) for row in result.fetchall()}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while getting awarded medals " + str(e))
+
+    # medals: [(id_club, id_user, id_medal_quality)], un executemany
+    async def award_medals(self, medals: List[tuple]):
+        try:
+            await self.db.execute(self.medals_awarded.insert(),
+                                  [{"id_club": id_club, "id_user": id_user, "id_medal_quality": id_medal_quality}
+                                   for id_club, id_user, id_medal_quality in medals])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="DB Error while awarding medals " + str(e))
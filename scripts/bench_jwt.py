@@ -0,0 +1,56 @@
+"""Compara el costo de validar un token en get_token_club.
+
+Uso:
+    python scripts/bench_jwt.py [--iterations 20000] [--algorithm HS256]
+
+Mide python-jose (verificación completa, lo que se hacía en cada request) contra
+un acierto en VerifiedTokenCache (sha256 + búsqueda). No compara otras librerías de
+JWT: el paquete jwt de requirements.txt no es PyJWT y ocupa su nombre de import.
+"""
+import argparse
+import os
+import sys
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from jose import jwt as jose_jwt  # noqa: E402
+
+from core.token_cache import VerifiedTokenCache  # noqa: E402
+
+SECRET_KEY = "bench-secret-key"
+
+
+def measure(name, function, iterations, repeats=5):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        samples.append((time.perf_counter() - started) / iterations)
+    per_call = median(samples)
+    print(f"{name:<28} {per_call * 1e6:9.2f} us/token  {1 / per_call:12.0f} tokens/s")
+    return per_call
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--algorithm", default="HS256")
+    args = parser.parse_args(argv)
+
+    claims = {"user": 42, "role": "Member", "club": 7, "exp": int(time.time()) + 3600}
+    token = jose_jwt.encode(claims, SECRET_KEY, algorithm=args.algorithm)
+
+    baseline = measure("python-jose decode", lambda: jose_jwt.decode(token, SECRET_KEY, algorithms=[args.algorithm]),
+                       args.iterations)
+
+    cache = VerifiedTokenCache(10000, 3600)
+    cache.set(token, {"user": 42, "role": "Member", "club": 7}, claims["exp"])
+    cached = measure("VerifiedTokenCache hit", lambda: cache.get(token), args.iterations)
+    print(f"cache hit is {baseline / cached:.1f}x faster than python-jose")
+
+
+if __name__ == "__main__":
+    main()
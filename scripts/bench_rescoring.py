@@ -0,0 +1,86 @@
+"""Compara re-calificar los resultados de un quiz fila por fila contra la pasada vectorizada.
+
+Uso:
+    python scripts/bench_rescoring.py [--sizes 10000 100000] [--questions 5]
+
+Mide QuizService.calculate_score en un loop (lo que costaría re-calificar envío por envío)
+y grading_service (armar la matriz de respuestas + grade_submissions), y verifica que
+ambos den exactamente los mismos puntajes.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from services.grading_service import answer_matrix, grade_submissions  # noqa: E402
+from services.quiz_service import MAX_QUANTITY_QUESTIONS, QuizService  # noqa: E402
+
+OPTIONS = ("a", "b", "c", "d")
+
+
+def make_submissions(size: int, quantity_questions: int, minutes_to_answer: int, seed: int = 7):
+    rng = random.Random(seed)
+    answers = [[rng.choice(OPTIONS) for _ in range(quantity_questions)] for _ in range(size)]
+    time_spent = [rng.randint(1, minutes_to_answer * 60) for _ in range(size)]
+    return answers, time_spent
+
+
+def rescore_loop(answers, time_spent, correct_quiz):
+    scores = []
+    counts = []
+    for row_answers, row_time in zip(answers, time_spent):
+        score, answered_correctly = QuizService.calculate_score(
+            None, SimpleNamespace(answers=row_answers, time_spent=row_time), correct_quiz)
+        scores.append(score)
+        counts.append(answered_correctly.count(True))
+    return scores, counts
+
+
+def rescore_vectorized(answers, time_spent, correct_quiz):
+    matrix = answer_matrix(answers, correct_quiz.quantity_questions)
+    return grade_submissions(matrix, np.array(time_spent), correct_quiz.correct_answers,
+                             correct_quiz.minutes_to_answer, MAX_QUANTITY_QUESTIONS)
+
+
+def measure(function, repeats):
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    correct_quiz = SimpleNamespace(correct_answers=[OPTIONS[i % len(OPTIONS)] for i in range(args.questions)],
+                                   minutes_to_answer=args.questions,
+                                   quantity_questions=args.questions)
+    print(f"{'submissions':>12} {'loop':>10} {'numpy':>10} {'speedup':>8}")
+    for size in args.sizes:
+        answers, time_spent = make_submissions(size, args.questions, correct_quiz.minutes_to_answer)
+        loop_seconds, (loop_scores, loop_counts) = measure(
+            lambda: rescore_loop(answers, time_spent, correct_quiz), args.repeats)
+        numpy_seconds, (scores, counts) = measure(
+            lambda: rescore_vectorized(answers, time_spent, correct_quiz), args.repeats)
+        if scores.tolist() != [float(score) for score in loop_scores] or counts.tolist() != loop_counts:
+            print(f"Scores differ for {size} submissions")
+            return 1
+        print(f"{size:>12} {loop_seconds * 1e3:8.1f}ms {numpy_seconds * 1e3:8.1f}ms {loop_seconds / numpy_seconds:7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
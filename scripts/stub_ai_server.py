@@ -0,0 +1,60 @@
+"""Servidor falso de la API de IA para probar la generación de quizzes sin el servicio real.
+
+Uso:
+    python scripts/stub_ai_server.py [--port 9000] [--delay 2] [--fail-rate 0]
+    # y en el .env: AI_API_URL=http://127.0.0.1:9000/generate
+
+Responde con el mismo formato que la API real (questions / options / answers)
+después de --delay segundos; con --fail-rate responde 500 esa fracción de veces.
+"""
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+app = FastAPI(title="Stub AI API")
+config = {"delay": 2.0, "fail_rate": 0.0, "questions": 5}
+calls = {"total": 0}
+
+
+class QuizRequest(BaseModel):
+    resource_url: str
+    id_user: str
+
+
+@app.post("/generate")
+async def generate_quiz(request: QuizRequest):
+    calls["total"] += 1
+    await asyncio.sleep(config["delay"])
+    if random.random() < config["fail_rate"]:
+        raise HTTPException(status_code=500, detail="Stub AI failure")
+    questions, options, answers = [], [], []
+    for number in range(1, config["questions"] + 1):
+        questions.append(f"{number}. Pregunta {number} sobre {request.resource_url}")
+        options.extend(f"{letter}- Opción {letter} de la pregunta {number}" for letter in "abcd")
+        answers.append(random.choice("abcd"))
+    return {"questions": questions, "options": options, "answers": answers}
+
+
+@app.get("/calls")
+async def get_calls():
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=2.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--questions", type=int, default=5)
+    args = parser.parse_args()
+    config.update(delay=args.delay, fail_rate=args.fail_rate, questions=args.questions)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
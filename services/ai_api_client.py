@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+from fastapi import HTTPException
+
+from core.app_settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Corta las llamadas a un servicio que viene fallando.
+
+    Tras failure_threshold llamadas fallidas seguidas se abre por reset_seconds y
+    las llamadas fallan al instante; luego deja pasar una llamada de prueba
+    (half-open) y, según cómo salga, se cierra o vuelve a abrirse.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_progress:
+            self._trial_in_progress = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+
+    # La llamada no llegó a la IA (p. ej. no hubo cupo): no dice nada sobre su estado
+    def release_trial(self):
+        self._trial_in_progress = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class AIApiClient:
+    """Cliente HTTP compartido (keep-alive) para la API de IA que genera los quizzes.
+
+    Limita las llamadas simultáneas, reintenta los errores transitorios (timeouts,
+    errores de conexión, 429 y 5xx) con backoff exponencial y jitter, y pasa por un
+    circuit breaker para fallar rápido cuando la IA está caída.
+    """
+
+    def __init__(self, url: str, connect_timeout: float, read_timeout: float, max_concurrency: int,
+                 queue_timeout: float, max_retries: int, retry_backoff: float, breaker: CircuitBreaker):
+        self.url = url
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Se crea en el primer uso para que quede ligado al event loop que corre la app
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                headers={"Content-Type": "application/json"})
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post_once(self, payload: dict) -> dict:
+        try:
+            response = await self.client.post(self.url, json=payload)
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            raise _RetryableError(f"{type(e).__name__}: {e}")
+        if response.status_code == 429 or response.status_code >= 500:
+            raise _RetryableError(f"AI_API answered {response.status_code}")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Error while getting quiz from AI_API" + response.text)
+        try:
+            return response.json()
+        except ValueError as e:
+            # Un 200 con un cuerpo que no es JSON (p. ej. la página de error de un proxy) se reintenta
+            raise _RetryableError(f"AI_API answered invalid JSON: {e}")
+
+    async def post(self, payload: dict) -> dict:
+        if not self.breaker.allow():
+            raise HTTPException(status_code=503, detail="AI_API is unavailable, try again later")
+        # Si allow() dejó pasar la llamada estando half-open, esta es la llamada de prueba
+        is_trial = self.breaker.state == "half_open"
+        try:
+            # Si ya hay max_concurrency llamadas en curso se espera poco y se rechaza en vez de encolar sin límite
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=503, detail="AI_API is busy, try again later")
+            try:
+                return await self._post_with_retries(payload)
+            finally:
+                self._semaphore.release()
+        finally:
+            # Cualquier salida (incluida una cancelación) libera la prueba; record_* ya lo hizo si se llegó a la IA
+            if is_trial:
+                self.breaker.release_trial()
+
+    async def _post_with_retries(self, payload: dict) -> dict:
+        self.calls += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                data = await self._post_once(payload)
+                self.breaker.record_success()
+                return data
+            except _RetryableError as e:
+                error = str(e)
+                if attempt < self.max_retries:
+                    self.retries += 1
+                    # Full jitter: espera un tiempo al azar hasta el backoff exponencial
+                    await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+            except HTTPException:
+                # Error del lado del cliente (4xx): la IA respondió, no cuenta como caída
+                self.breaker.record_success()
+                raise
+        self.failures += 1
+        self.breaker.record_failure()
+        logger.warning("AI_API call failed after %s attempts: %s", self.max_retries + 1, error)
+        raise HTTPException(status_code=502, detail="Error while getting quiz from AI_API: " + error)
+
+    def stats(self) -> dict:
+        return {
+            "calls_total": self.calls,
+            "retries_total": self.retries,
+            "failures_total": self.failures,
+            "in_flight": self.max_concurrency - self._semaphore._value,
+            "max_concurrency": self.max_concurrency,
+            "breaker_state": self.breaker.state,
+            "breaker_rejected_total": self.breaker.rejected,
+        }
+
+
+ai_api = AIApiClient(settings.AI_API_URL,
+                     connect_timeout=settings.AI_API_CONNECT_TIMEOUT,
+                     read_timeout=settings.AI_API_READ_TIMEOUT,
+                     max_concurrency=settings.AI_API_MAX_CONCURRENCY,
+                     queue_timeout=settings.AI_API_QUEUE_TIMEOUT,
+                     max_retries=settings.AI_API_MAX_RETRIES,
+                     retry_backoff=settings.AI_API_RETRY_BACKOFF_SECONDS,
+                     breaker=CircuitBreaker(settings.AI_API_BREAKER_FAILURES, settings.AI_API_BREAKER_RESET_SECONDS))
@@ -0,0 +1,37 @@
+from core.app_settings import get_settings
+from core.cache import MISSING, TTLCache
+
+settings = get_settings()
+
+
+class ClubCache:
+    """Clubes activos por id_club, más un índice club_code -> id_club.
+
+    update_club y delete_club invalidan la entrada después del commit; el TTL
+    acota el desfase con cambios hechos por otros procesos.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self.by_id = TTLCache(maxsize, ttl_seconds)
+        self.code_index = TTLCache(maxsize, ttl_seconds)
+
+    def get_by_id(self, club_id: int):
+        return self.by_id.get(club_id)
+
+    def get_by_code(self, club_code: str):
+        club_id = self.code_index.get(club_code)
+        if club_id is MISSING:
+            return MISSING
+        return self.by_id.get(club_id)
+
+    def set(self, club):
+        self.by_id.set(club.id_club, club)
+        self.code_index.set(club.club_code, club.id_club)
+
+    def invalidate(self, club_id: int):
+        club = self.by_id.pop(club_id)
+        if club is not MISSING:
+            self.code_index.pop(club.club_code)
+
+
+club_cache = ClubCache(settings.CLUB_CACHE_SIZE, settings.CLUB_CACHE_TTL_SECONDS)
@@ -1,14 +1,24 @@
 from fastapi import Depends, HTTPException, status
 import random
 import string
+from typing import List, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from core import app_settings
-from models.responses import NewClub, UpdateClub, ProfileInfoUp
+from core.cache import MISSING
+from core.token_cache import VerifiedTokenCache
+from core.database import get_db, run_after_commit
+from models.responses import NewClub, UpdateClub, ProfileInfoUp, MyRank, BulkMembershipResult, MembershipOutcome
 from repositories.club_repository import ClubRepository
+from services.club_cache_service import club_cache
+from services.leaderboard_service import leaderboards
+from services.medal_summary_service import medal_summaries
+from services.reference_data_service import reference_data
 
 settings = app_settings.get_settings()
 
@@ -17,8 +27,13 @@ ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="access_token")
+# Los clientes reutilizan el mismo token durante toda su vida: la firma se verifica una vez
+verified_tokens = VerifiedTokenCache(settings.JWT_CACHE_SIZE, settings.JWT_CACHE_MAX_TTL_SECONDS)
 
 def get_token_club(token: str = Depends(oauth2_scheme)) -> dict:
+    claims = verified_tokens.get(token)
+    if claims is not MISSING:
+        return dict(claims)
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Wrong credentials, not authorized",
@@ -33,7 +48,9 @@ def get_token_club(token: str = Depends(oauth2_scheme)) -> dict:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    return {"user": user_id, "role": role_name, "club": club_id}
+    claims = {"user": user_id, "role": role_name, "club": club_id}
+    verified_tokens.set(token, claims, payload.get("exp"))
+    return dict(claims)
 
 def generate_club_code(is_private: bool, is_academic: bool) -> str:
     if is_private:
@@ -50,75 +67,198 @@ def generate_club_code(is_private: bool, is_academic: bool) -> str:
     suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
     return prefix + suffix
 
+def _bulk_result(outcomes: dict) -> BulkMembershipResult:
+    return BulkMembershipResult(results=[MembershipOutcome(id_user=user_id, status=status)
+                                         for user_id, status in outcomes.items()])
+
 class ClubService:
-    def __init__(self):
-        self.repository = ClubRepository()
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.repository = ClubRepository(db)
+
+    async def create_club(self, newclub :NewClub):
+        # Sin consultas previas: el índice único de club_code decide y el repositorio reintenta
+        club_codes = (generate_club_code(newclub.is_private, newclub.is_academic)
+                      for _ in range(settings.CLUB_CODE_MAX_ATTEMPTS))
+        # Club y fundador van en la transacción del request: get_db hace el único commit
+        # o el rollback de los dos si algo falla
+        id_club = await self.repository.create_club(newclub, club_codes)
+        await self.repository.add_founder_to_club(id_club, newclub.id_user)
+        return True
+
+    async def update_club(self, updateclub: UpdateClub, club_id: int):
+        updated = await self.repository.update_club(updateclub, club_id)
+        run_after_commit(self.db, lambda: club_cache.invalidate(club_id))
+        return updated
+
+    async def delete_club(self, club_id: int):
+        deleted = await self.repository.delete_club(club_id)
+        run_after_commit(self.db, lambda: club_cache.invalidate(club_id))
+        return deleted
+
+    # Acepta el id_club o el club_code (los códigos nunca son solo dígitos)
+    async def get_club(self, club_id: str):
+        if club_id.isdigit():
+            return await self.get_club_by_id(int(club_id))
+        return await self.get_club_by_code(club_id)
+
+    async def get_club_by_id(self, club_id: int):
+        club = club_cache.get_by_id(club_id)
+        if club is MISSING:
+            club = await self.repository.get_club_by_id(club_id)
+            club_cache.set(club)
+        return club
+
+    async def get_founded_clubs(self, user_id: int):
+        return await self.repository.get_founded_clubs(user_id)
+
+    async def get_joined_clubs(self, user_id: int):
+        return await self.repository.get_joined_clubs(user_id)
+
+    async def get_my_clubs(self, user_id: int):
+        return await self.repository.get_my_clubs(user_id)
+
+    async def request_membership(self, club_id: int, user_id: int):
+        return await self.repository.request_membership(club_id, user_id)
+
+    async def get_requests(self, user_id: int):
+        return await self.repository.get_requests(user_id)
+
+    async def add_member(self, club_id: int, user_id: int):
+        added = await self.repository.add_member(club_id, user_id)
+        run_after_commit(self.db, lambda: leaderboards.invalidate(club_id))
+        return added
+
+    async def approve_membership(self, club_id: int, user_id: int):
+        # La solicitud aprobada y el alta como miembro van en la misma transacción del request
+        await self.repository.approve_membership(club_id, user_id)
+        await self.repository.add_member(club_id, user_id)
+        run_after_commit(self.db, lambda: leaderboards.invalidate(club_id))
+        return True
+
+    async def reject_membership(self, club_id: int, user_id: int):
+        return await self.repository.reject_membership(club_id, user_id)
+
+    # Operaciones masivas: toda la lista va en la transacción del request y el resultado se informa por usuario
+
+    async def add_members(self, club_id: int, user_ids: List[int]):
+        user_ids = list(dict.fromkeys(user_ids))
+        outcomes = await self.repository.add_members(club_id, user_ids)
+        run_after_commit(self.db, lambda: leaderboards.invalidate(club_id))
+        return _bulk_result(outcomes)
+
+    async def approve_memberships(self, club_id: int, user_ids: List[int]):
+        user_ids = list(dict.fromkeys(user_ids))
+        outcomes = await self.repository.approve_memberships(club_id, user_ids)
+        approved = [user_id for user_id, status in outcomes.items() if status == "approved"]
+        if approved:
+            await self.repository.add_members(club_id, approved)
+        run_after_commit(self.db, lambda: leaderboards.invalidate(club_id))
+        return _bulk_result(outcomes)
 
-    def create_club(self, newclub :NewClub):
-        club_code = generate_club_code(newclub.is_private, newclub.is_academic)
-        while not self.repository.is_unique_club_code(club_code):
-            club_code = generate_club_code(newclub.is_private, newclub.is_academic)
-        return self.repository.create_club(newclub, club_code)
+    async def reject_memberships(self, club_id: int, user_ids: List[int]):
+        outcomes = await self.repository.reject_memberships(club_id, list(dict.fromkeys(user_ids)))
+        return _bulk_result(outcomes)
 
-    def update_club(self, updateclub: UpdateClub, club_id: int):
-        return self.repository.update_club(updateclub, club_id)
+    async def remove_members(self, club_id: int, user_ids: List[int]):
+        outcomes = await self.repository.remove_members(club_id, list(dict.fromkeys(user_ids)))
+        removed = [user_id for user_id, status in outcomes.items() if status == "removed"]
 
-    def delete_club(self, club_id: int):
-        return self.repository.delete_club(club_id)
+        def update_leaderboard():
+            for user_id in removed:
+                leaderboards.remove_member(club_id, user_id)
+        run_after_commit(self.db, update_leaderboard)
+        return _bulk_result(outcomes)
 
-    def get_club(self, club_id: str):
-        return self.repository.get_club(club_id)
+    async def get_club_requests(self, club_id: int):
+        return await self.repository.get_club_requests_with_user_names(club_id)
 
-    def get_founded_clubs(self, user_id: int):
-        return self.repository.get_founded_clubs(user_id)
+    async def remove_member(self, club_id: int, user_id: int):
+        removed = await self.repository.remove_member(club_id, user_id)
+        run_after_commit(self.db, lambda: leaderboards.remove_member(club_id, user_id))
+        return removed
 
-    def get_joined_clubs(self, user_id: int):
-        return self.repository.get_joined_clubs(user_id)
+    async def get_club_ranking(self, club_id: int):
+        board = await leaderboards.get(club_id, self.repository.get_club_ranking)
+        return board.slice(0, len(board))
 
-    def request_membership(self, club_id: int, user_id: int):
-        return self.repository.request_membership(club_id, user_id)
+    async def get_club_ranking_top(self, club_id: int, n: int):
+        board = await leaderboards.get(club_id, self.repository.get_club_ranking)
+        return board.top(n)
 
-    def get_requests(self, user_id: int):
-        return self.repository.get_requests(user_id)
+    async def get_club_ranking_page(self, club_id: int, page: int, size: int):
+        board = await leaderboards.get(club_id, self.repository.get_club_ranking)
+        return board.page(page, size)
 
-    def add_member(self, club_id: int, user_id: int):
-        return self.repository.add_member(club_id, user_id)
+    async def get_member_rank(self, club_id: int, user_id: int, neighbours: int):
+        board = await leaderboards.get(club_id, self.repository.get_club_ranking)
+        return MyRank(rank=board.rank_of(user_id),
+                      total_members=len(board),
+                      neighbours=board.around(user_id, neighbours))
 
-    def approve_membership(self, club_id: int, user_id: int):
-        return self.repository.approve_membership(club_id, user_id)
+    async def get_club_by_code(self, club_code: str):
+        club = club_cache.get_by_code(club_code)
+        if club is MISSING:
+            club = await self.repository.get_club_by_code(club_code)
+            club_cache.set(club)
+        return club
 
-    def reject_membership(self, club_id: int, user_id: int):
-        return self.repository.reject_membership(club_id, user_id)
+    async def get_member_medals_by_club(self, club_id: int, user_id: int):
+        medals = medal_summaries.by_club_user.get((club_id, user_id))
+        if medals is MISSING:
+            quality_ids = await self.repository.get_member_medals_by_club(club_id, user_id)
+            medals = (await reference_data.get_for_medals(quality_ids)).medals_by_club(quality_ids)
+            medal_summaries.by_club_user.set((club_id, user_id), medals)
+        return medals
 
-    def get_club_requests(self, club_id: int):
-        return self.repository.get_club_requests_with_user_names(club_id)
+    async def get_user_medals(self, user_id: int):
+        return (await self.get_users_medals([user_id]))[user_id]
 
-    def remove_member(self, club_id: int, user_id: int):
-        return self.repository.remove_member(club_id, user_id)
+    # Medallas de muchos usuarios (p. ej. una página de ranking): las que no están en caché
+    # se traen todas juntas en una sola consulta
+    async def get_users_medals(self, user_ids: List[int]):
+        medals_by_user = {}
+        missing_ids = []
+        for user_id in dict.fromkeys(user_ids):
+            medals = medal_summaries.by_user.get(user_id)
+            if medals is MISSING:
+                missing_ids.append(user_id)
+            else:
+                medals_by_user[user_id] = medals
+        if missing_ids:
+            medal_counts = await self.repository.get_users_medals(missing_ids)
+            data = await reference_data.get_for_medals({id_medal_quality for counts in medal_counts.values()
+                                                        for id_medal_quality, _ in counts})
+            for user_id, counts in medal_counts.items():
+                medals_by_user[user_id] = data.medals_by_user(counts)
+                medal_summaries.by_user.set(user_id, medals_by_user[user_id])
+        return medals_by_user
 
-    def get_club_ranking(self, club_id: int):
-        return self.repository.get_club_ranking(club_id)
+    async def get_user_profile(self, user_id: int):
+        return await self.repository.get_user_profile(user_id)
 
-    def get_club_by_code(self, club_code: str):
-        return self.repository.get_club(club_code)
+    # Perfil, carrera, completitud y contadores de clubes en una consulta; las medallas salen del caché
+    async def get_user_full_profile(self, user_id: int):
+        profile = await self.repository.get_user_full_profile(user_id)
+        profile.medals = await self.get_user_medals(user_id)
+        return profile
 
-    def get_member_medals_by_club(self, club_id: int, user_id: int):
-        return self.repository.get_member_medals_by_club(club_id, user_id)
+    async def update_user_profile(self, user_profile: ProfileInfoUp):
+        return await self.repository.update_user_profile(user_profile)
 
-    def get_user_medals(self, user_id: int):
-        return self.repository.get_user_medals(user_id)
+    async def check_user_info(self, user_id: int):
+        return await self.repository.check_user_info(user_id)
 
-    def get_user_profile(self, user_id: int):
-        return self.repository.get_user_profile(user_id)
+    async def get_all_clubs(self, user_id: int):
+        return await self.repository.get_all_clubs(user_id)
 
-    def update_user_profile(self, user_profile: ProfileInfoUp):
-        return self.repository.update_user_profile(user_profile)
+    async def discover_clubs(self, user_id: int, search: Optional[str], is_private: Optional[bool],
+                             is_academic: Optional[bool], cursor: Optional[int], limit: int):
+        return await self.repository.discover_clubs(user_id, search, is_private, is_academic, cursor, limit)
 
-    def check_user_info(self, user_id: int):
-        return self.repository.check_user_info(user_id)
+    async def get_all_careers(self):
+        return (await reference_data.get()).careers
 
-    def get_all_clubs(self, user_id: int):
-        return self.repository.get_all_clubs(user_id)
 
-    def get_all_careers(self):
-        return self.repository.get_all_careers()
\ No newline at end of file
+async def get_club_service(db: AsyncSession = Depends(get_db)) -> ClubService:
+    return ClubService(db)
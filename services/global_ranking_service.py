@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+
+from core.app_settings import get_settings
+from core.database import async_session
+from models.responses import GlobalRankEntry, GlobalRankingPage, GlobalUserRank
+from repositories.club_repository import ClubRepository
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class GlobalRankingSnapshot:
+    """Ranking global compacto: arrays paralelos ordenados por global_score descendente."""
+
+    def __init__(self, rows):
+        self.as_of = datetime.now(timezone.utc)
+        self.loaded_at = time.monotonic()
+        self.user_ids = array('q')
+        self.scores = array('d')
+        self.user_names = []
+        for row in rows:
+            self.user_ids.append(row.id_user)
+            self.scores.append(float(row.global_score or 0))
+            self.user_names.append(row.user_name)
+        # Puntajes negados en orden ascendente para contar con bisect cuántos usuarios quedan debajo
+        self._negated_scores = array('d', (-score for score in self.scores))
+        self._positions = {id_user: position for position, id_user in enumerate(self.user_ids)}
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def staleness_seconds(self) -> float:
+        return round(time.monotonic() - self.loaded_at, 3)
+
+    def page(self, page: int, size: int) -> GlobalRankingPage:
+        start = (page - 1) * size
+        entries = [GlobalRankEntry(rank=position + 1,
+                                   id_user=self.user_ids[position],
+                                   user_name=self.user_names[position],
+                                   global_score=self.scores[position])
+                   for position in range(start, min(start + size, len(self)))]
+        return GlobalRankingPage(entries=entries,
+                                 total_users=len(self),
+                                 as_of=self.as_of,
+                                 staleness_seconds=self.staleness_seconds())
+
+    def user_rank(self, id_user: int) -> GlobalUserRank:
+        position = self._positions.get(id_user)
+        rank = percentile = score = None
+        if position is not None:
+            score = self.scores[position]
+            rank = position + 1
+            # Percentil = porcentaje de usuarios con un puntaje estrictamente menor
+            below = len(self) - bisect_right(self._negated_scores, -score)
+            percentile = round(100 * below / len(self), 2)
+        return GlobalUserRank(id_user=id_user,
+                              rank=rank,
+                              percentile=percentile,
+                              global_score=score,
+                              total_users=len(self),
+                              as_of=self.as_of,
+                              staleness_seconds=self.staleness_seconds())
+
+
+class GlobalRankingService:
+    """Mantiene el ranking global en memoria y lo recalcula cada refresh_seconds en segundo plano."""
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self.snapshot = None
+        self._lock = asyncio.Lock()
+
+    async def _load(self):
+        async with async_session() as db:
+            rows = await ClubRepository(db).get_global_scores()
+        self.snapshot = GlobalRankingSnapshot(rows)
+
+    async def refresh(self):
+        async with self._lock:
+            await self._load()
+
+    async def get_snapshot(self) -> GlobalRankingSnapshot:
+        # Solo espera a MySQL si el refresco en segundo plano aún no cargó el primer snapshot
+        if self.snapshot is None:
+            async with self._lock:
+                if self.snapshot is None:
+                    await self._load()
+        return self.snapshot
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Error while refreshing the global ranking")
+            await asyncio.sleep(self.refresh_seconds)
+
+    async def get_page(self, page: int, size: int) -> GlobalRankingPage:
+        return (await self.get_snapshot()).page(page, size)
+
+    async def get_user_rank(self, id_user: int) -> GlobalUserRank:
+        return (await self.get_snapshot()).user_rank(id_user)
+
+
+global_ranking = GlobalRankingService(settings.GLOBAL_RANKING_REFRESH_SECONDS)
@@ -0,0 +1,37 @@
+from typing import List, Sequence
+
+import numpy as np
+
+# Bonificación por rapidez: (fracción del tiempo disponible, multiplicador), de la más rápida a la más lenta
+TIME_BONUS_TIERS = ((0.25, 1.3), (0.5, 1.2), (0.75, 1.1))
+
+
+def answer_matrix(answers: Sequence[List[str]], quantity_questions: int) -> np.ndarray:
+    """Matriz (envíos x preguntas) de respuestas; las que faltan quedan vacías y cuentan como incorrectas."""
+    padding = [""] * quantity_questions
+    # Solo se copian las filas de otro largo (p. ej. enviadas antes de regenerar con otra cantidad de preguntas)
+    rows = [row if len(row) == quantity_questions else (list(row) + padding)[:quantity_questions]
+            for row in answers]
+    # dtype=object compara los mismos str que el loop por fila, sin convertirlos a un array de texto
+    matrix = np.empty((len(rows), quantity_questions), dtype=object)
+    matrix[:] = rows
+    return matrix
+
+
+def grade_submissions(answers: np.ndarray, time_spent: np.ndarray, correct_answers: List[str],
+                      minutes_to_answer: int, max_score: float):
+    """Califica todos los envíos de un quiz a la vez con las mismas reglas que QuizService.calculate_score.
+
+    Devuelve (puntajes, cantidad de respuestas correctas), alineados con las filas de answers.
+    """
+    quantity_questions = len(correct_answers)
+    is_correct = answers == np.array(correct_answers, dtype=object)
+    answer_value = max_score / quantity_questions
+    # Se suma pregunta por pregunta (como el loop por fila) para obtener exactamente los mismos floats
+    scores = np.zeros(len(answers))
+    for column in range(quantity_questions):
+        scores += np.where(is_correct[:, column], answer_value, 0.0)
+    total_time = minutes_to_answer * 60
+    multipliers = np.select([time_spent <= total_time * fraction for fraction, _ in TIME_BONUS_TIERS],
+                            [multiplier for _, multiplier in TIME_BONUS_TIERS], 1.0)
+    return scores * multipliers, is_correct.sum(axis=1)
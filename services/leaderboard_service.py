@@ -0,0 +1,116 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+
+from core.app_settings import get_settings
+from models.responses import RankedMember
+
+settings = get_settings()
+
+
+class ClubLeaderboard:
+    """Ranking de un club en memoria, ordenado por total_score descendente (empates por id_user).
+
+    _order guarda tuplas (-score, id_user) ordenadas, así la posición de un usuario
+    se encuentra con bisect en O(log n) y top/páginas son un slice.
+    """
+
+    def __init__(self, members):
+        self.loaded_at = time.monotonic()
+        self._members = {}
+        self._order = []
+        for member in members:
+            self._members[member.id_user] = (float(member.total_score or 0), member.user_name)
+            self._order.append((-float(member.total_score or 0), member.id_user))
+        self._order.sort()
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, id_user):
+        return id_user in self._members
+
+    def add_score(self, id_user: int, delta: float) -> bool:
+        if id_user not in self._members:
+            return False
+        score, user_name = self._members[id_user]
+        self.remove(id_user)
+        self._members[id_user] = (score + delta, user_name)
+        insort(self._order, (-(score + delta), id_user))
+        return True
+
+    def remove(self, id_user: int):
+        member = self._members.pop(id_user, None)
+        if member is not None:
+            index = bisect_left(self._order, (-member[0], id_user))
+            del self._order[index]
+
+    def rank_of(self, id_user: int):
+        member = self._members.get(id_user)
+        if member is None:
+            return None
+        return bisect_left(self._order, (-member[0], id_user)) + 1
+
+    def slice(self, start: int, stop: int):
+        ranked = []
+        for position, (_, id_user) in enumerate(self._order[start:stop], start=start + 1):
+            score, user_name = self._members[id_user]
+            ranked.append(RankedMember(rank=position, id_user=id_user, user_name=user_name, total_score=score))
+        return ranked
+
+    def top(self, n: int):
+        return self.slice(0, n)
+
+    def page(self, page: int, size: int):
+        return self.slice((page - 1) * size, page * size)
+
+    def around(self, id_user: int, neighbours: int):
+        rank = self.rank_of(id_user)
+        if rank is None:
+            return []
+        return self.slice(max(rank - 1 - neighbours, 0), rank + neighbours)
+
+
+class LeaderboardRegistry:
+    """Rankings por club cargados bajo demanda y mantenidos incrementalmente.
+
+    Cada ranking se recarga de MySQL cuando pasa max_age_seconds, para corregir
+    cualquier cambio de total_score hecho fuera de este proceso.
+    """
+
+    def __init__(self, max_age_seconds: int):
+        self.max_age_seconds = max_age_seconds
+        self._boards = {}
+        self._locks = {}
+
+    def _is_fresh(self, board):
+        return board is not None and time.monotonic() - board.loaded_at < self.max_age_seconds
+
+    async def get(self, club_id: int, loader) -> ClubLeaderboard:
+        board = self._boards.get(club_id)
+        if self._is_fresh(board):
+            return board
+        lock = self._locks.setdefault(club_id, asyncio.Lock())
+        async with lock:
+            board = self._boards.get(club_id)
+            if not self._is_fresh(board):
+                members = await loader(club_id)
+                board = self._boards[club_id] = ClubLeaderboard(members)
+            return board
+
+    def record_score(self, club_id: int, id_user: int, delta: float):
+        board = self._boards.get(club_id)
+        if board is not None and not board.add_score(id_user, delta):
+            # Miembro que aún no estaba en el ranking: se recarga en la próxima lectura
+            self.invalidate(club_id)
+
+    def remove_member(self, club_id: int, id_user: int):
+        board = self._boards.get(club_id)
+        if board is not None:
+            board.remove(id_user)
+
+    def invalidate(self, club_id: int):
+        self._boards.pop(club_id, None)
+
+
+leaderboards = LeaderboardRegistry(settings.LEADERBOARD_MAX_AGE_SECONDS)
@@ -0,0 +1,24 @@
+from core.app_settings import get_settings
+from core.cache import TTLCache
+
+settings = get_settings()
+
+
+class MedalSummaryStore:
+    """Resúmenes de medallas ya calculados, por usuario y por (club, usuario).
+
+    Quien otorga medallas debe llamar a invalidate() después del commit para que
+    el siguiente perfil vea la medalla nueva; el TTL acota cualquier otro desfase.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self.by_user = TTLCache(maxsize, ttl_seconds)
+        self.by_club_user = TTLCache(maxsize, ttl_seconds)
+
+    def invalidate(self, id_user: int, id_club: int = None):
+        self.by_user.pop(id_user)
+        if id_club is not None:
+            self.by_club_user.pop((id_club, id_user))
+
+
+medal_summaries = MedalSummaryStore(settings.MEDAL_SUMMARY_CACHE_SIZE, settings.MEDAL_SUMMARY_TTL_SECONDS)
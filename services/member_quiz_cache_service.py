@@ -0,0 +1,50 @@
+import json
+
+from core.app_settings import get_settings
+from core.cache import TTLCache
+from core.http_cache import make_etag
+
+settings = get_settings()
+
+
+class MemberQuizPayload:
+    """Quiz listo para enviar a los miembros: JSON ya serializado y sin respuestas correctas."""
+
+    def __init__(self, quiz):
+        payload = {
+            "id_quiz": quiz.id_quiz,
+            # En la BD questions y answers son strings JSON: se decodifican una sola vez aquí
+            "questions": json.loads(quiz.questions),
+            "answers": json.loads(quiz.answers),
+            "quantity_questions": quiz.quantity_questions,
+            "minutes_to_answer": quiz.minutes_to_answer,
+            "id_reading_resource": quiz.id_reading_resource,
+        }
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        # La versión es el digest del contenido: cambia cuando se regenera el quiz
+        self.etag = make_etag(self.body)
+
+
+class MemberQuizCache:
+    """Payloads de quiz para miembros por (resource_id, versión del quiz).
+
+    Al regenerar cambia la versión, así que ningún worker vuelve a servir la anterior;
+    invalidate solo libera antes la entrada vieja en el proceso que regeneró.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self.payloads = TTLCache(maxsize, ttl_seconds)
+
+    def get(self, resource_id: int, version: int):
+        return self.payloads.get((resource_id, version))
+
+    def set(self, quiz) -> MemberQuizPayload:
+        payload = MemberQuizPayload(quiz)
+        self.payloads.set((quiz.id_reading_resource, quiz.version), payload)
+        return payload
+
+    def invalidate(self, resource_id: int, version: int):
+        self.payloads.pop((resource_id, version))
+
+
+member_quizzes = MemberQuizCache(settings.MEMBER_QUIZ_CACHE_SIZE, settings.MEMBER_QUIZ_CACHE_TTL_SECONDS)
@@ -0,0 +1,266 @@
+import asyncio
+import itertools
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from core.app_settings import get_settings
+from core.database import async_session, commit
+from core.events import events
+from models.responses import QuizJobStatus
+from repositories.quiz_job_repository import QuizJobRepository
+from services.quiz_service import QuizService
+from services.resource_service import ResourceService, ResourceUploaded
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Prioridad de los trabajos pedidos por un founder que está esperando; números menores salen antes
+PRIORITY_ON_DEMAND = 0
+
+
+class QuizJob:
+    def __init__(self, resource_id: int, id_club: int, id_user: str, regenerate: bool, priority: int):
+        self.job_id = uuid.uuid4().hex
+        self.resource_id = resource_id
+        self.id_club = id_club
+        self.id_user = id_user
+        self.regenerate = regenerate
+        self.priority = priority
+        self.status = "queued"
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.result = None
+        # Trabajo del mismo recurso que debe terminar antes, y los que esperan a este
+        self.waiting_for = None
+        self.followers = []
+
+    @classmethod
+    def from_row(cls, row: dict) -> "QuizJob":
+        job = cls(row["resource_id"], row["id_club"], None, row["regenerate"], PRIORITY_ON_DEMAND)
+        for field in ("job_id", "status", "created_at", "started_at", "finished_at", "error", "result"):
+            setattr(job, field, row[field])
+        return job
+
+    def to_status(self) -> QuizJobStatus:
+        return QuizJobStatus(job_id=self.job_id,
+                             resource_id=self.resource_id,
+                             regenerate=self.regenerate,
+                             status=self.status,
+                             created_at=self.created_at,
+                             started_at=self.started_at,
+                             finished_at=self.finished_at,
+                             error=self.error,
+                             result=self.result)
+
+
+class QuizJobQueue:
+    """Genera quizzes con la IA en segundo plano para no tener un worker HTTP esperando.
+
+    Los pedidos iguales (mismo resource_id y regenerate) para un trabajo en cola o en
+    curso se unen a ese trabajo. Un trabajo distinto del mismo recurso (p. ej. regenerar
+    mientras se genera) espera a que termine el anterior y recién entonces se encola.
+
+    La cola vive en memoria del proceso, pero el estado de cada trabajo se guarda en
+    quiz_jobs para consultarlo desde cualquier worker (hasta retention_seconds). Dos
+    workers pueden generar el mismo recurso a la vez: el índice único de quizzez deja
+    solo el primer quiz guardado y el otro trabajo devuelve ese.
+
+    Los trabajos que no terminan (cancelados al apagar o perdidos en una caída) se
+    marcan como fallidos: al apagar los de este proceso y al arrancar los que llevan
+    más de abandoned_seconds sin terminar.
+
+    Los trabajos con prioridad mayor que PRIORITY_ON_DEMAND (la pre-generación al
+    subir un recurso) van a una cola de fondo atendida por background_workers.
+    """
+
+    def __init__(self, workers: int, retention_seconds: int, abandoned_seconds: int, background_workers: int = 0,
+                 pregenerate_priority: int = PRIORITY_ON_DEMAND + 1):
+        self.workers = workers
+        self.background_workers = background_workers
+        self.retention_seconds = retention_seconds
+        self.abandoned_seconds = abandoned_seconds
+        self.pregenerate_priority = pregenerate_priority
+        self._uploads = events.subscribe(ResourceUploaded)
+        self._queue = asyncio.PriorityQueue()
+        self._background_queue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._in_flight = {}
+        # Trabajos de este proceso cuyo estado final todavía no se guardó
+        self._unfinished = {}
+        self.succeeded = 0
+        self.failed = 0
+
+    async def submit(self, resource_id: int, id_club: int, id_user: str, regenerate: bool = False,
+                     priority: int = PRIORITY_ON_DEMAND) -> QuizJob:
+        job = self._in_flight.get((resource_id, regenerate))
+        if job is not None:
+            if job.status == "queued" and priority < job.priority:
+                # Alguien pidió ya un quiz que aún esperaba en la cola de fondo: se adelanta.
+                # La copia que queda en la otra cola se descarta al salir (ver _worker)
+                job.priority = priority
+                if job.waiting_for is None:
+                    self._enqueue(job)
+            return job
+        job = QuizJob(resource_id, id_club, id_user, regenerate, priority)
+        # Se registra antes del await para que un pedido concurrente se una a este trabajo
+        self._in_flight[(resource_id, regenerate)] = job
+        try:
+            await self._save(job, create=True)
+        except Exception:
+            self._in_flight.pop((resource_id, regenerate), None)
+            raise
+        self._unfinished[job.job_id] = job
+        pending = self._in_flight.get((resource_id, not regenerate))
+        if pending is not None:
+            job.waiting_for = pending
+            pending.followers.append(job)
+        else:
+            self._enqueue(job)
+        return job
+
+    def _enqueue(self, job: QuizJob):
+        queue = self._queue if job.priority <= PRIORITY_ON_DEMAND else self._background_queue
+        queue.put_nowait((job.priority, next(self._sequence), job))
+
+    # Estado del trabajo desde quiz_jobs (puede haberlo creado otro worker), o None
+    async def get(self, job_id: str):
+        async with async_session(info={"use_primary": True}) as db:
+            row = await QuizJobRepository(db).get(job_id)
+        return QuizJob.from_row(row) if row is not None else None
+
+    async def _save(self, job: QuizJob, create: bool = False):
+        # Sesión propia en el primario: el cliente consulta el estado apenas recibe el 202
+        async with async_session(info={"use_primary": True}) as db:
+            repository = QuizJobRepository(db)
+            if create:
+                await repository.create(job)
+            else:
+                await repository.update(job)
+                if job.finished_at is not None:
+                    await repository.delete_finished_before(
+                        job.finished_at - timedelta(seconds=self.retention_seconds))
+            await commit(db)
+
+    async def _save_progress(self, job: QuizJob):
+        try:
+            await self._save(job)
+        except Exception:
+            logger.exception("Could not store the state of quiz job %s", job.job_id)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "background_workers": self.background_workers,
+            "queued": sum(1 for job in self._in_flight.values() if job.status == "queued"),
+            "in_flight": len(self._in_flight),
+            "succeeded_total": self.succeeded,
+            "failed_total": self.failed,
+        }
+
+    async def _execute(self, job: QuizJob):
+        # Sesiones propias del trabajo, siempre en el primario. Ninguna queda abierta durante
+        # la llamada a la IA: cada worker de generación tendría tomada una conexión del pool
+        async with async_session(info={"use_primary": True}) as db:
+            quiz_service = QuizService(db)
+            if not job.regenerate:
+                quiz = await quiz_service.find_quiz(job.resource_id)
+                if quiz is not None:
+                    return jsonable_encoder(quiz)
+            resource_url = await ResourceService(db).get_resource_url(job.resource_id)
+        quiz_data = await quiz_service.get_data(resource_url, job.id_user)
+        async with async_session(info={"use_primary": True}) as db:
+            quiz_service = QuizService(db)
+            if job.regenerate:
+                quiz = await quiz_service.regen_quiz(job.resource_id, quiz_data)
+            else:
+                quiz = await quiz_service.save_quiz(job.resource_id, quiz_data)
+            await commit(db)
+        return jsonable_encoder(quiz)
+
+    async def _process(self, job: QuizJob):
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        try:
+            await self._save_progress(job)
+            job.result = await self._execute(job)
+            job.status = "succeeded"
+            self.succeeded += 1
+        except HTTPException as e:
+            job.status = "failed"
+            job.error = str(e.detail)
+            self.failed += 1
+        except Exception as e:
+            logger.exception("Quiz generation job %s failed", job.job_id)
+            job.status = "failed"
+            job.error = str(e)
+            self.failed += 1
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            self._in_flight.pop((job.resource_id, job.regenerate), None)
+            for follower in job.followers:
+                follower.waiting_for = None
+                self._enqueue(follower)
+            job.followers = []
+        await self._save_progress(job)
+        self._unfinished.pop(job.job_id, None)
+
+    async def _worker(self, queue: asyncio.PriorityQueue):
+        while True:
+            _, _, job = await queue.get()
+            try:
+                # Un trabajo adelantado está en las dos colas: solo lo procesa la primera que lo saca
+                if job.status == "queued":
+                    await self._process(job)
+            finally:
+                queue.task_done()
+
+    # Pre-generación: cada recurso subido (ResourceService.upload_resource) encola su quiz
+    async def _pregenerate(self):
+        while True:
+            upload = await self._uploads.get()
+            try:
+                await self.submit(upload.resource_id, upload.id_club, upload.id_user,
+                                  priority=self.pregenerate_priority)
+            except Exception:
+                logger.exception("Could not queue quiz pre-generation for resource %s", upload.resource_id)
+
+    # Al arrancar: los trabajos que quedaron sin terminar hace más de abandoned_seconds (su proceso
+    # se cayó antes de guardar el estado final) pasan a fallidos
+    async def _fail_abandoned(self):
+        now = datetime.now(timezone.utc)
+        try:
+            async with async_session(info={"use_primary": True}) as db:
+                failed = await QuizJobRepository(db).fail_unfinished(
+                    "Abandoned: the worker stopped before finishing", now,
+                    created_before=now - timedelta(seconds=self.abandoned_seconds))
+                await commit(db)
+            if failed:
+                logger.warning("Marked %s abandoned quiz jobs as failed", failed)
+        except Exception:
+            logger.exception("Could not mark abandoned quiz jobs as failed")
+
+    async def run(self):
+        await self._fail_abandoned()
+        await asyncio.gather(self._pregenerate(),
+                             *(self._worker(self._queue) for _ in range(self.workers)),
+                             *(self._worker(self._background_queue) for _ in range(self.background_workers)))
+
+    # Al apagar (después de cancelar run): los trabajos de este proceso en cola o cortados a mitad
+    async def shutdown(self):
+        if not self._unfinished:
+            return
+        async with async_session(info={"use_primary": True}) as db:
+            await QuizJobRepository(db).fail_unfinished("Cancelled at shutdown", datetime.now(timezone.utc),
+                                                        job_ids=list(self._unfinished))
+            await commit(db)
+        self._unfinished.clear()
+
+
+quiz_jobs = QuizJobQueue(settings.QUIZ_JOB_WORKERS, settings.QUIZ_JOB_RETENTION_SECONDS, settings.QUIZ_JOB_ABANDONED_SECONDS,
+                         settings.QUIZ_PREGENERATE_WORKERS, settings.QUIZ_PREGENERATE_PRIORITY)
@@ -1,18 +1,30 @@
 from typing import List
 
-import requests
-from fastapi import HTTPException
+import numpy as np
+from fastapi import Depends, HTTPException
 from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.app_settings import get_settings
+from core.cache import MISSING, TTLCache
+from core.database import get_db, run_after_commit
+from core.events import events
 from models.responses import QuizSubmit
-from repositories.quiz_repository import QuizRepository
+from repositories.quiz_repository import QUIZ_VERSION_CHANGED, QuizRepository
+from services.ai_api_client import ai_api
+from services.grading_service import answer_matrix, grade_submissions
+from services.member_quiz_cache_service import member_quizzes
 from services.resource_service import ResourceService
+from services.score_pipeline_service import QuizScoreChanged
 
 settings = get_settings()
+# Respuestas correctas (con su versión) por id_quiz: cada envío las necesita y el INSERT del
+# resultado comprueba que la versión siga siendo la actual
+answer_keys = TTLCache(settings.ANSWER_KEY_CACHE_SIZE, settings.ANSWER_KEY_CACHE_TTL_SECONDS)
 
 import json
 MAX_QUANTITY_QUESTIONS = 5
+SCORE_TOLERANCE = 1e-5
 
 def process_quiz_data(quiz_json):
     try:
@@ -74,40 +86,35 @@ def process_quiz_data(quiz_json):
 
 
 class QuizService:
-    def __init__(self):
-        self.quiz_repository = QuizRepository()
-        self.resource_service = ResourceService()
-
-    def get_quiz(self, resource_id: int, id_user: str):
-        if self.quiz_repository.quiz_exists(resource_id):
-            return self.quiz_repository.get_quiz(resource_id)
-
-        # Si no existe el quiz en la base de datos, se obtiene de la IA_API
-        else:
-            quiz = self.get_data(resource_id, id_user)
-            self.quiz_repository.save_quiz(resource_id, quiz)
-            return self.get_quiz_from_db_for_founder(resource_id)
-
-    def get_data(self, resource_id: int, id_user: str):
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.quiz_repository = QuizRepository(db)
+        self.resource_service = ResourceService(db)
+
+    # Guarda el quiz generado para el recurso y lo devuelve. Si otro worker lo guardó mientras se
+    # esperaba a la IA, el índice único uq_quizzez_id_reading_resource rechaza este y queda el suyo
+    async def save_quiz(self, resource_id: int, quiz: dict):
+        await self.quiz_repository.save_quiz(resource_id, quiz)
+        return await self.get_quiz_from_db_for_founder(resource_id)
+
+    # Quiz ya generado del recurso, o None si todavía no existe (no llama a la IA)
+    async def find_quiz(self, resource_id: int):
+        if await self.quiz_repository.quiz_exists(resource_id):
+            return await self.quiz_repository.get_quiz(resource_id)
+        return None
+
+    # Pide el quiz a la IA. No usa la sesión: quien llama no debe tener una conexión tomada
+    # mientras espera (con los reintentos de ai_api puede tardar minutos)
+    async def get_data(self, resource_url: str, id_user: str):
 
         try:
 
-            url = settings.AI_API_URL # URL de la API externa
-            headers = {
-                "Content-Type": "application/json"  # Establece el tipo de contenido a JSON
-
-            }
             data_sent = {
-                "resource_url": self.resource_service.get_resource_url(resource_id), # URL del recurso
+                "resource_url": resource_url, # URL del recurso
                 "id_user": id_user  # ID del usuario
             }
-            response = requests.post(url, headers=headers, json=data_sent)  # Envía el 'data' en formato JSON
-            data_quiz = response.json()  # Obtiene el JSON de la respuesta
-            print(data_sent)
-            # Verifica la respuesta
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Error while getting quiz from AI_API" + str(data_quiz))
+            # Cliente compartido: keep-alive, timeouts, reintentos y circuit breaker (ver ai_api_client)
+            data_quiz = await ai_api.post(data_sent)
 
             # Verifica que la estructura del JSON sea la esperada
             if not self.is_validate_quiz_response(data_quiz):
@@ -131,37 +138,111 @@ class QuizService:
 
         return True
 
-    def get_quiz_from_db_for_founder(self, resource_id: int):
-        if not self.quiz_repository.quiz_exists(resource_id):
+    async def get_quiz_from_db_for_founder(self, resource_id: int):
+        if not await self.quiz_repository.quiz_exists(resource_id):
             raise HTTPException(status_code=404, detail="Quiz not found")
-        return self.quiz_repository.get_quiz(resource_id)
-
-    def get_quiz_from_db_for_members(self, resource_id: int):
-        if not self.quiz_repository.quiz_exists(resource_id):
-            raise HTTPException(status_code=404, detail="Quiz not found")
-        return self.quiz_repository.get_quiz_from_db_for_members(resource_id)
-
-    def regen_quiz(self, resource_id: int, id_user: str):
-        quiz = self.get_data(resource_id, id_user)
-        self.quiz_repository.regen_quiz(resource_id, quiz)
-        return self.get_quiz_from_db_for_founder(resource_id)
-
-    def submit_quiz(self, quiz_submit: QuizSubmit, id_user: int, id_club: int, id_role: int):
-        correct_quiz = self.quiz_repository.get_items_quiz(quiz_submit.id_quiz)
-        if not self.quiz_repository.is_quiz_answered(id_user, id_club, quiz_submit.id_quiz):
-            correct_answers = correct_quiz.correct_answers
+        return await self.quiz_repository.get_quiz(resource_id)
+
+    async def get_quiz_from_db_for_members(self, resource_id: int):
+        # El repositorio ya responde 404 si no existe; no hace falta consultar antes
+        return await self.quiz_repository.get_quiz_from_db_for_members(resource_id)
+
+    # Quiz para miembros desde el caché de payloads ya serializados: solo se consulta la versión
+    # actual (una columna por PK) para no servir preguntas de antes de una regeneración
+    async def get_member_quiz_payload(self, resource_id: int):
+        version = await self.quiz_repository.get_quiz_version(resource_id)
+        payload = member_quizzes.get(resource_id, version)
+        if payload is MISSING:
+            quiz = await self.quiz_repository.get_quiz_from_db_for_members(resource_id)
+            payload = member_quizzes.set(quiz)
+        return payload
+
+    # Reemplaza el quiz del recurso por uno recién generado. El quiz anterior se lee con FOR UPDATE:
+    # es el último confirmado y otra regeneración concurrente espera a que esta termine
+    async def regen_quiz(self, resource_id: int, quiz: dict):
+        previous_quiz = await self.quiz_repository.get_quiz(resource_id, for_update=True)
+        id_quiz = await self.quiz_repository.regen_quiz(resource_id, quiz)
+        # Los resultados ya guardados se re-califican en la misma transacción que la nueva clave
+        await self.rescore_quiz(id_quiz)
+
+        def invalidate_caches():
+            member_quizzes.invalidate(resource_id, previous_quiz.version)
+            answer_keys.pop(id_quiz)
+        run_after_commit(self.db, invalidate_caches)
+        return await self.get_quiz_from_db_for_founder(resource_id)
+
+    # Re-califica en una pasada vectorizada todos los resultados del quiz contra su clave actual
+    # y publica los que cambiaron: score_pipeline ajusta totales, rankings y medallas con la diferencia
+    async def rescore_quiz(self, id_quiz: int) -> int:
+        results = await self.quiz_repository.get_results_for_rescoring(id_quiz)
+        if not results:
+            return 0
+        correct_quiz = await self.quiz_repository.get_items_quiz(id_quiz)
+        answers = answer_matrix([json.loads(result.answers) for result in results], correct_quiz.quantity_questions)
+        time_spent = np.array([result.time_spent for result in results])
+        scores, correct_counts = grade_submissions(answers, time_spent, correct_quiz.correct_answers,
+                                                   correct_quiz.minutes_to_answer, MAX_QUANTITY_QUESTIONS)
+        old_scores = np.array([result.score or 0 for result in results], dtype=float)
+        old_counts = np.array([result.quantity_correct_answers or 0 for result in results])
+        # Tolerancia para la precisión con la que MySQL guarda score
+        changed = np.flatnonzero(~np.isclose(scores, old_scores, rtol=0, atol=SCORE_TOLERANCE)
+                                 | (correct_counts != old_counts))
+        if not len(changed):
+            return 0
+
+        updates = []
+        changes = []
+        for index in changed.tolist():
+            result = results[index]
+            score = float(scores[index])
+            quantity_correct = int(correct_counts[index])
+            updates.append({"id_user": result.id_user, "id_club": result.id_club,
+                            "score": score, "quantity_correct_answers": quantity_correct})
+            changes.append(QuizScoreChanged(result.id_user, result.id_club, id_quiz))
+        await self.quiz_repository.update_scores(id_quiz, updates, settings.RESCORE_BATCH_SIZE)
+
+        def publish_changes():
+            for event in changes:
+                events.publish(event)
+        run_after_commit(self.db, publish_changes)
+        return len(changes)
+
+    # Respuestas correctas del quiz desde el caché en memoria. reload las vuelve a leer bloqueadas en
+    # el primario: son las vigentes y un regen_quiz no puede cambiarlas antes del commit
+    async def get_answer_key(self, id_quiz: int, reload: bool = False):
+        answer_key = MISSING if reload else answer_keys.get(id_quiz)
+        if answer_key is MISSING:
+            answer_key = await self.quiz_repository.get_items_quiz(id_quiz, for_share=reload)
+            answer_keys.set(id_quiz, answer_key)
+        return answer_key
+
+    # Con la clave en caché un envío normal es una sola sentencia (el INSERT ... SELECT que
+    # comprueba la versión del quiz). Si el quiz se regeneró se recarga la clave y se vuelve a
+    # calificar; si el resultado ya existía (reintento o doble envío) se devuelve el guardado
+    async def submit_quiz(self, quiz_submit: QuizSubmit, id_user: int, id_club: int, id_role: int):
+        correct_quiz = await self.get_answer_key(quiz_submit.id_quiz)
+        while True:
             score, answered_correctly = self.calculate_score(quiz_submit, correct_quiz)
-            return self.quiz_repository.submit_quiz(score,
-                                                    correct_answers,
-                                                    quiz_submit.time_spent,
-                                                    answered_correctly,
-                                                    quiz_submit.id_quiz,
-                                                    id_user, id_club, id_role)
-        else:
-            return self.quiz_repository.get_quiz_results(id_user, id_club, quiz_submit.id_quiz, correct_quiz.correct_answers)
-
-    def check_quiz_answered(self, id_quiz: int, id_club:int, id_user: int):
-        return JSONResponse(content={"answered": self.quiz_repository.is_quiz_answered(id_user, id_club, id_quiz)})
+            response = await self.quiz_repository.submit_quiz(score,
+                                                              correct_quiz.correct_answers,
+                                                              quiz_submit.time_spent,
+                                                              answered_correctly,
+                                                              quiz_submit.id_quiz,
+                                                              id_user, id_club, id_role,
+                                                              quiz_submit.answers,
+                                                              correct_quiz.version)
+            if response is not QUIZ_VERSION_CHANGED:
+                break
+            correct_quiz = await self.get_answer_key(quiz_submit.id_quiz, reload=True)
+        if response is None:
+            return await self.quiz_repository.get_quiz_results(id_user, id_club, quiz_submit.id_quiz, correct_quiz.correct_answers)
+        # Totales, puntaje global, rankings y medallas los actualiza score_pipeline en segundo plano
+        event = QuizScoreChanged(id_user, id_club, quiz_submit.id_quiz)
+        run_after_commit(self.db, lambda: events.publish(event))
+        return response
+
+    async def check_quiz_answered(self, id_quiz: int, id_club:int, id_user: int):
+        return JSONResponse(content={"answered": await self.quiz_repository.is_quiz_answered(id_user, id_club, id_quiz)})
 
     def calculate_score(self, quiz_submit: QuizSubmit, correct_quiz):
         score = 0
@@ -185,4 +266,5 @@ class QuizService:
         return score, answered_correctly
 
 
-
+async def get_quiz_service(db: AsyncSession = Depends(get_db)) -> QuizService:
+    return QuizService(db)
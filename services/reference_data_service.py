@@ -0,0 +1,88 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from core.app_settings import get_settings
+from core.database import async_session
+from models.responses import MedalsByClub, MedalsByUser
+from repositories.club_repository import ClubRepository
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class ReferenceData:
+    """Carreras y catálogo de medallas tal como estaban en la BD al momento de cargarlos."""
+
+    def __init__(self, careers, medal_catalog):
+        self.as_of = datetime.now(timezone.utc)
+        self.loaded_at = time.monotonic()
+        self.careers = careers
+        self.medal_catalog = medal_catalog
+        self._medals = {medal.id_medal_quality: medal for medal in medal_catalog}
+        # JSON ya serializado para responder sin volver a convertir los modelos en cada request
+        self.careers_json = json.dumps([career.model_dump() for career in careers]).encode()
+        self.medal_catalog_json = json.dumps([medal.model_dump() for medal in medal_catalog]).encode()
+
+    def knows_medals(self, quality_ids) -> bool:
+        return all(id_medal_quality in self._medals for id_medal_quality in quality_ids)
+
+    def medals_by_user(self, medal_counts):
+        return [MedalsByUser(medal_type_name=self._medals[id_medal_quality].medal_type_name,
+                             medal_q_name=self._medals[id_medal_quality].medal_q_name,
+                             quantity=quantity)
+                for id_medal_quality, quantity in medal_counts if id_medal_quality in self._medals]
+
+    def medals_by_club(self, quality_ids):
+        return [MedalsByClub(medal_type_name=self._medals[id_medal_quality].medal_type_name,
+                             medal_q_name=self._medals[id_medal_quality].medal_q_name)
+                for id_medal_quality in quality_ids if id_medal_quality in self._medals]
+
+
+class ReferenceDataService:
+    """Carga los datos de referencia al arrancar y los recarga cada ttl_seconds o a pedido (admin)."""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.data = None
+        self._lock = asyncio.Lock()
+
+    async def _load(self):
+        async with async_session() as db:
+            repository = ClubRepository(db)
+            careers = await repository.get_all_careers()
+            medal_catalog = await repository.get_medal_catalog()
+        self.data = ReferenceData(careers, medal_catalog)
+
+    async def refresh(self) -> ReferenceData:
+        async with self._lock:
+            await self._load()
+        return self.data
+
+    async def get(self) -> ReferenceData:
+        if self.data is None:
+            async with self._lock:
+                if self.data is None:
+                    await self._load()
+        return self.data
+
+    # Devuelve datos que conocen todas las medallas pedidas: si aparece una calidad
+    # creada después de la última carga, se recarga una vez antes de responder
+    async def get_for_medals(self, quality_ids) -> ReferenceData:
+        data = await self.get()
+        if not data.knows_medals(quality_ids):
+            data = await self.refresh()
+        return data
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Error while refreshing the reference data")
+            await asyncio.sleep(self.ttl_seconds)
+
+
+reference_data = ReferenceDataService(settings.REFERENCE_DATA_TTL_SECONDS)
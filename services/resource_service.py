@@ -3,44 +3,73 @@ import uuid
 from fastapi import Depends, HTTPException, status, UploadFile, File
 from fastapi.responses import StreamingResponse
 
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
 from models.responses import ResourceToUpload
 from core.app_settings import get_settings
+from core.database import get_db, run_after_commit
+from core.events import events
 from repositories.resource_repository import ResourceRepository
 import boto3
 
 settings = get_settings()
+
+
+class ResourceUploaded:
+    """Recurso recién subido; quiz_job_service lo usa para pre-generar su quiz."""
+
+    def __init__(self, resource_id: int, id_club: int, id_user: str):
+        self.resource_id = resource_id
+        self.id_club = id_club
+        self.id_user = id_user
+
+
 class ResourceService:
-    def __init__(self):
-        self.repository = ResourceRepository()
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.repository = ResourceRepository(db)
 
 
-    # 2592000 = 30 days
-    def upload_resource(self, info: ResourceToUpload, id_club:int, file: UploadFile = File(...)):
+    # 2592000 = 30 days. Devuelve el id_reading_resource del recurso creado
+    async def upload_resource(self, info: ResourceToUpload, id_club:int, id_user: str, file: UploadFile = File(...)):
         if file.content_type != 'application/pdf':
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         file_uuid = str(uuid.uuid4())  # Esto generará un identificador único para el archivo
         filename = file_uuid + ".pdf"
         bucket_name = get_settings().AWS_BUCKET_NAME
         key = f"readings/{filename}"
-        self.get_s3_client().upload_fileobj(file.file, bucket_name, key)
-        url = self.get_s3_client().generate_presigned_url('get_object',
-                                                Params={'Bucket': bucket_name, 'Key': key},
-                                                ExpiresIn=2592000)
-        return self.repository.create_resource(info, id_club, url)
+        # boto3 es bloqueante: la subida a S3 corre en el threadpool
+        s3_client = self.get_s3_client()
+        await run_in_threadpool(s3_client.upload_fileobj, file.file, bucket_name, key)
+        url = await run_in_threadpool(s3_client.generate_presigned_url, 'get_object',
+                                      Params={'Bucket': bucket_name, 'Key': key},
+                                      ExpiresIn=2592000)
+        resource_id = await self.repository.create_resource(info, id_club, url)
+        if settings.QUIZ_PREGENERATE_ON_UPLOAD:
+            # Tras el commit (el worker debe poder leer el recurso) se avisa a la cola de quizzes;
+            # la subida no espera a la IA
+            event = ResourceUploaded(resource_id, id_club, id_user)
+            run_after_commit(self.db, lambda: events.publish(event))
+        return resource_id
 
-    def get_resource_url(self, resource_id: int):
-        return self.repository.get_resource_url(resource_id)
+    async def get_resource_url(self, resource_id: int):
+        return await self.repository.get_resource_url(resource_id)
 
-    def get_all_resources_by_club(self, club_id: int):
-        return self.repository.get_all_resources_by_club(club_id)
+    async def get_all_resources_by_club(self, club_id: int):
+        return await self.repository.get_all_resources_by_club(club_id)
 
-    def get_ranking_by_resource(self, resource_id: int):
-        return self.repository.get_resource_ranking(resource_id)
+    async def get_ranking_by_resource(self, resource_id: int):
+        return await self.repository.get_resource_ranking(resource_id)
 
-    def delete_resource(self, resource_id: int):
-        return self.repository.delete_resource(resource_id)
+    async def delete_resource(self, resource_id: int):
+        return await self.repository.delete_resource(resource_id)
 
     def get_s3_client(self):
         return boto3.client('s3',
                             aws_access_key_id=get_settings().AWS_ACCESS_KEY_ID,
                             aws_secret_access_key=get_settings().AWS_SECRET_ACCESS_KEY)
+
+
+async def get_resource_service(db: AsyncSession = Depends(get_db)) -> ResourceService:
+    return ResourceService(db)
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import time
+
+from core.app_settings import get_settings
+from core.database import async_session, commit, run_after_commit
+from core.events import events
+from core.metrics import Histogram
+from repositories.score_repository import ScoreRepository
+from services.leaderboard_service import leaderboards
+from services.medal_summary_service import medal_summaries
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Límites (en segundos) del histograma de demora entre el commit del envío y su aplicación
+EVENT_LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Contadores de participant_role_club que pueden usar las reglas de medallas
+MEDAL_RULE_COUNTERS = ('total_score', 'quantity_quizzes_solved', 'quantity_questions_answered', 'quantity_perfect_quizzes')
+
+
+class QuizScoreChanged:
+    """Cambió el resultado de un miembro en un quiz: un envío nuevo o un re-cálculo.
+
+    Solo identifica el resultado. Lo que falta sumar a los totales se calcula al
+    aplicarlo, desde quiz_results (score contra applied_score), así que aplicar dos
+    veces el mismo evento no suma dos veces.
+    """
+
+    def __init__(self, id_user: int, id_club: int, id_quiz: int):
+        self.id_user = id_user
+        self.id_club = id_club
+        self.id_quiz = id_quiz
+        self.published_at = time.monotonic()
+        self.attempts = 0
+
+    def key(self) -> tuple:
+        return self.id_user, self.id_club, self.id_quiz
+
+    def __repr__(self):
+        return f"QuizScoreChanged(id_user={self.id_user}, id_club={self.id_club}, id_quiz={self.id_quiz})"
+
+
+class MedalRule:
+    """Otorga id_medal_quality (una sola vez por club) cuando counter llega a threshold."""
+
+    def __init__(self, counter: str, threshold: float, id_medal_quality: int):
+        if counter not in MEDAL_RULE_COUNTERS:
+            raise ValueError(f"Unknown medal rule counter {counter}, expected one of {MEDAL_RULE_COUNTERS}")
+        self.counter = counter
+        self.threshold = threshold
+        self.id_medal_quality = id_medal_quality
+
+
+class ScorePipeline:
+    """Aplica en segundo plano y por lotes lo que deriva de cada envío de quiz.
+
+    Por lote: suma total_score y contadores en participant_role_club, suma
+    global_score en users, evalúa las reglas de medallas y, tras el commit,
+    actualiza los rankings en memoria e invalida los resúmenes de medallas.
+
+    quiz_results guarda lo ya sumado de cada resultado (applied_score,
+    applied_perfect) y si le queda algo por aplicar (score_pending), en la misma
+    transacción que los totales: reintentar un lote, incluso tras un COMMIT dudoso,
+    no suma dos veces. Un lote que falla se reintenta hasta max_attempts veces por
+    evento; los eventos descartados o perdidos (cola llena, worker caído) los
+    recupera el barrido de resultados pendientes, al arrancar y cada sweep_seconds.
+    """
+
+    def __init__(self, batch_size: int, batch_wait_seconds: float, max_attempts: int, queue_size: int,
+                 sweep_seconds: float, medal_rules):
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.max_attempts = max_attempts
+        self.sweep_seconds = sweep_seconds
+        self.medal_rules = [MedalRule(**rule) for rule in medal_rules]
+        self.queue = events.subscribe(QuizScoreChanged, queue_size)
+        self.lag = Histogram(EVENT_LAG_BUCKETS)
+        self.processed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.swept = 0
+        self.medals_awarded = 0
+        self.last_batch_at = None
+        self._current = None
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait_seconds
+        try:
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Se apaga mientras juntaba el lote: lo devuelve a la cola para drain()
+            for event in batch:
+                self.queue.put_nowait(event)
+            raise
+        return batch
+
+    # Diferencia entre lo que vale cada resultado y lo que ya se sumó, agrupada por (club, usuario)
+    # y por usuario, más el nuevo estado aplicado de cada resultado
+    @staticmethod
+    def _aggregate(results):
+        club_deltas = {}
+        global_deltas = {}
+        applied = []
+        for result in results:
+            first_time = result.applied_score is None
+            score_delta = float(result.score or 0) - float(result.applied_score or 0)
+            perfect = int(result.quantity_questions is not None
+                          and result.quantity_correct_answers == result.quantity_questions)
+            delta = club_deltas.setdefault((result.id_club, result.id_user), {
+                "id_club": result.id_club, "id_user": result.id_user,
+                "score": 0.0, "solved": 0, "questions": 0, "perfect": 0})
+            delta["score"] += score_delta
+            delta["solved"] += int(first_time)
+            delta["questions"] += (result.quantity_questions or 0) if first_time else 0
+            delta["perfect"] += perfect - int(result.applied_perfect or 0)
+            global_deltas[result.id_user] = global_deltas.get(result.id_user, 0.0) + score_delta
+            applied.append({"id_user": result.id_user, "id_club": result.id_club, "id_quiz": result.id_quiz,
+                            "applied_score": result.score, "applied_perfect": perfect})
+        return list(club_deltas.values()), global_deltas, applied
+
+    async def _award_medals(self, repository: ScoreRepository, pairs):
+        if not self.medal_rules:
+            return []
+        counters = await repository.get_counters(pairs)
+        already_awarded = await repository.get_awarded(pairs, [rule.id_medal_quality for rule in self.medal_rules])
+        new_medals = []
+        for row in counters:
+            for rule in self.medal_rules:
+                medal = (row.id_club, row.id_user, rule.id_medal_quality)
+                if medal not in already_awarded and float(getattr(row, rule.counter) or 0) >= rule.threshold:
+                    new_medals.append(medal)
+                    already_awarded.add(medal)
+        if new_medals:
+            await repository.award_medals(new_medals)
+        return new_medals
+
+    # Aplica los resultados keys [(id_user, id_club, id_quiz)] que sigan pendientes y devuelve cuántos
+    async def _apply(self, keys):
+        # Sesión propia en el primario: el lote lee contadores que acaba de escribir
+        async with async_session(info={"use_primary": True}) as db:
+            repository = ScoreRepository(db)
+            # Bloqueados hasta el commit: otro worker que aplique los mismos espera y después los ve aplicados
+            results = await repository.lock_pending_results(keys)
+            if not results:
+                return 0
+            club_deltas, global_deltas, applied = self._aggregate(results)
+            await repository.add_to_club_totals(club_deltas)
+            await repository.add_to_global_scores(global_deltas)
+            new_medals = await self._award_medals(repository, [(d["id_club"], d["id_user"]) for d in club_deltas])
+            await repository.mark_applied(applied)
+
+            def update_caches():
+                for delta in club_deltas:
+                    leaderboards.record_score(delta["id_club"], delta["id_user"], delta["score"])
+                for id_club, id_user, _ in new_medals:
+                    medal_summaries.invalidate(id_user, id_club)
+            run_after_commit(db, update_caches)
+            await commit(db)
+        self.medals_awarded += len(new_medals)
+        return len(results)
+
+    async def _process(self, batch):
+        try:
+            await self._apply(list(dict.fromkeys(event.key() for event in batch)))
+        except Exception:
+            self.failed_batches += 1
+            logger.exception("Error while applying %s score events", len(batch))
+            for event in batch:
+                event.attempts += 1
+                if event.attempts < self.max_attempts:
+                    try:
+                        self.queue.put_nowait(event)
+                        continue
+                    except asyncio.QueueFull:
+                        pass
+                # El resultado sigue pendiente en quiz_results: lo aplica el próximo barrido
+                self.dropped += 1
+                logger.error("Dropping score event after %s attempts: %s", event.attempts, event)
+            await asyncio.sleep(self.batch_wait_seconds)
+            return
+        now = time.monotonic()
+        for event in batch:
+            self.lag.observe(now - event.published_at)
+        self.processed += len(batch)
+        self.batches += 1
+        self.last_batch_at = now
+
+    async def _consume(self):
+        while True:
+            batch = await self._next_batch()
+            # shield: si cancelan la tarea al apagar, el lote en curso termina igual (drain lo espera)
+            self._current = asyncio.ensure_future(self._process(batch))
+            try:
+                await asyncio.shield(self._current)
+            except Exception:
+                # Un lote no puede terminar el consumo: sus resultados siguen pendientes para el barrido
+                logger.exception("Unexpected error while processing %s score events", len(batch))
+
+    # Aplica los resultados que quedaron con score_pending (eventos descartados o perdidos en una caída)
+    async def sweep(self) -> int:
+        applied = 0
+        while True:
+            async with async_session(info={"use_primary": True}) as db:
+                keys = await ScoreRepository(db).get_pending_keys(self.batch_size)
+            if not keys:
+                return applied
+            batch_applied = await self._apply(keys)
+            # Pendientes que no se pueden aplicar (p. ej. el resultado ya no existe): no se insiste
+            if not batch_applied:
+                return applied
+            applied += batch_applied
+            self.swept += batch_applied
+
+    async def _sweep_periodically(self):
+        while True:
+            try:
+                applied = await self.sweep()
+                if applied:
+                    logger.warning("Applied %s pending quiz results missed by the score pipeline", applied)
+            except Exception:
+                logger.exception("Error while applying pending quiz results")
+            await asyncio.sleep(self.sweep_seconds)
+
+    async def run(self):
+        await asyncio.gather(self._consume(), self._sweep_periodically())
+
+    # Al apagar: termina el lote en curso y aplica lo que quedó en la cola
+    async def drain(self):
+        if self._current is not None and not self._current.done():
+            await self._current
+        while not self.queue.empty():
+            batch = [self.queue.get_nowait() for _ in range(min(self.batch_size, self.queue.qsize()))]
+            await self._process(batch)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "processed_total": self.processed,
+            "batches_total": self.batches,
+            "failed_batches_total": self.failed_batches,
+            "dropped_total": self.dropped,
+            "swept_total": self.swept,
+            "medals_awarded_total": self.medals_awarded,
+            "seconds_since_last_batch": None if self.last_batch_at is None
+            else round(time.monotonic() - self.last_batch_at, 3),
+            "lag_seconds": self.lag.snapshot(),
+        }
+
+
+score_pipeline = ScorePipeline(settings.SCORE_PIPELINE_BATCH_SIZE,
+                               settings.SCORE_PIPELINE_BATCH_WAIT_SECONDS,
+                               settings.SCORE_PIPELINE_MAX_ATTEMPTS,
+                               settings.SCORE_PIPELINE_QUEUE_SIZE,
+                               settings.SCORE_PIPELINE_SWEEP_SECONDS,
+                               settings.MEDAL_RULES)
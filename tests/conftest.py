@@ -0,0 +1,18 @@
+import os
+
+# Settings exige estas variables; los tests no se conectan a MySQL ni a S3
+for name, value in {
+    "MYSQL_DB_USERNAME": "test",
+    "MYSQL_DB_PASSWORD": "test",
+    "MYSQL_DB_HOST": "127.0.0.1",
+    "MYSQL_DB_PORT": "3306",
+    "MYSQL_DB_NAME": "test",
+    "SECRET_KEY": "test",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "AWS_BUCKET_NAME": "test",
+    "AI_API_URL": "http://127.0.0.1:9/quiz",
+}.items():
+    os.environ.setdefault(name, value)
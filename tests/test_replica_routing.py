@@ -0,0 +1,129 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine
+
+import core.database as database
+from repositories.club_repository import ClubRepository
+
+metadata = MetaData()
+clubs = Table('clubs', metadata,
+              Column('id_club', Integer, primary_key=True),
+              Column('club_code', String(10)),
+              Column('club_name', String(100)),
+              Column('club_desc', String(255)),
+              Column('is_private', Integer),
+              Column('is_academic', Integer),
+              Column('club_status', String(1)))
+participants = Table('participant_role_club', metadata,
+                     Column('id_club', Integer),
+                     Column('id_user', Integer),
+                     Column('id_role', Integer),
+                     Column('participant_status', String(1)))
+club_requests = Table('club_requests', metadata,
+                      Column('id_club', Integer),
+                      Column('id_user', Integer),
+                      Column('id_request_status', Integer),
+                      Column('request_date', String(50)))
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    replica_engine = SimpleNamespace(sync_engine=object())
+    monkeypatch.setattr(database, "replica_engine", replica_engine)
+    return replica_engine.sync_engine
+
+
+def club_repository():
+    # Sin __init__: las tablas se toman de este módulo en lugar del snapshot del esquema
+    repository = ClubRepository.__new__(ClubRepository)
+    repository.clubs_table = clubs
+    repository.participants_table = participants
+    repository.club_requests_table = club_requests
+    return repository
+
+
+def test_my_clubs_query_goes_to_replica(replica):
+    session = database.RoutingSession()
+    query = club_repository()._build_my_clubs_query()
+
+    assert session.get_bind(clause=query) is replica
+    assert "wrote" not in session.info
+    assert not session.info.get("use_primary")
+
+
+def test_locking_read_uses_primary_without_marking_a_write(replica):
+    session = database.RoutingSession()
+    query = clubs.select().where(clubs.c.id_club == 1).with_for_update()
+
+    assert session.get_bind(clause=query) is database.async_engine.sync_engine
+    assert session.info["use_primary"]
+    assert "wrote" not in session.info
+
+
+def test_write_uses_primary_and_keeps_following_reads_there(replica):
+    session = database.RoutingSession()
+
+    assert session.get_bind(clause=clubs.update().values(club_name="x")) is database.async_engine.sync_engine
+    assert session.info["wrote"]
+    assert session.get_bind(clause=club_repository()._build_my_clubs_query()) is database.async_engine.sync_engine
+
+
+def test_my_clubs_query_skips_inactive_memberships():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(clubs.insert(), [{"id_club": 1, "club_status": 'A'}, {"id_club": 2, "club_status": 'A'}])
+        connection.execute(participants.insert(), [
+            {"id_club": 1, "id_user": 7, "id_role": 2, "participant_status": 'A'},
+            {"id_club": 2, "id_user": 7, "id_role": 2, "participant_status": 'I'},
+        ])
+        rows = connection.execute(club_repository()._build_my_clubs_query(), {"id_user": 7}).all()
+
+    assert [row.id_club for row in rows] == [1]
+
+
+class FakeSession:
+    def __init__(self, info):
+        self.info = info
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+def test_read_primary_marker_travels_with_the_client(replica, monkeypatch):
+    sessions = []
+    monkeypatch.setattr(database, "async_session", lambda info: sessions.append(FakeSession(info)) or sessions[-1])
+    app = FastAPI()
+    app.middleware("http")(database.read_primary_marker)
+
+    @app.post("/write")
+    async def write(db=Depends(database.get_db)):
+        db.info["wrote"] = True
+        return JSONResponse({})
+
+    @app.get("/read")
+    async def read(db=Depends(database.get_db)):
+        return {}
+
+    writer = TestClient(app)
+    response = writer.post("/write")
+    assert database.READ_PRIMARY_COOKIE in response.cookies
+    assert database.READ_PRIMARY_HEADER in response.headers
+
+    # Otro worker (sin estado compartido) recibe la lectura: la marca viene con el cliente
+    writer.get("/read")
+    assert sessions[-1].info["use_primary"]
+    TestClient(app).get("/read", headers={database.READ_PRIMARY_HEADER: response.headers[database.READ_PRIMARY_HEADER]})
+    assert sessions[-1].info["use_primary"]
+    TestClient(app).get("/read")
+    assert not sessions[-1].info["use_primary"]